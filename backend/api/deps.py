@@ -1,8 +1,13 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, status, Request, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlmodel import Session
+from typing import Optional
+import secrets
+from core.config import settings
 from core.database import get_session
+from core.exceptions import APIException
 from core.security import verify_token
+from core.sharding import lookup_shard, get_shard_engine, shard_exists
 from models.user import User
 
 security = HTTPBearer()
@@ -44,4 +49,50 @@ def get_current_user(
 
 def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     """获取当前活跃用户"""
-    return current_user
\ No newline at end of file
+    return current_user
+
+
+def get_todo_session(
+    request: Request,
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session)
+):
+    """获取当前用户所在分片的数据库会话"""
+    placement = lookup_shard(session, current_user.id)
+
+    # 迁移期间只读，写请求稍后重试
+    if placement.migrating and request.method not in ("GET", "HEAD"):
+        raise APIException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            error_code="SHARD_MIGRATING",
+            message="Your data is being moved, please retry shortly",
+            details={"retryAfter": 2}
+        )
+
+    # 目录指向已不存在的分片（SHARD_COUNT被调小）
+    if not shard_exists(placement.shard):
+        raise APIException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            error_code="SHARD_UNAVAILABLE",
+            message="Your data is temporarily unavailable",
+            details={"shard": placement.shard}
+        )
+
+    # 分片0就是主库，直接复用当前会话
+    if placement.shard == 0:
+        yield session
+        return
+
+    with Session(get_shard_engine(placement.shard)) as shard_session:
+        yield shard_session
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """校验管理员令牌（未配置ADMIN_TOKEN时管理接口不可用）"""
+    if not settings.admin_token or x_admin_token is None or not secrets.compare_digest(
+        x_admin_token.encode("utf-8"), settings.admin_token.encode("utf-8")
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail={"error": {"code": "ADMIN_REQUIRED", "message": "Admin token required"}}
+        )
@@ -0,0 +1,108 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import PlainTextResponse
+from typing import List, Optional
+
+from api.deps import require_admin
+from core.profiling import continuous_profiler, render_collapsed, request_profiles, get_request_profile
+from core.memory import memory_report, start_tracing, stop_tracing, take_snapshot, list_snapshots, diff_snapshots
+from schemas.admin import (
+    ProfilerStartRequest, ProfilerStatus, TracemallocStartRequest, TracemallocStatus,
+    MemoryReport, SnapshotInfo, Snapshot, SnapshotDiffEntry
+)
+
+# 管理接口作用于处理该请求的worker进程
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.get("/profiler", response_model=ProfilerStatus)
+async def get_profiler_status():
+    """查看持续采样状态"""
+    return continuous_profiler.status()
+
+@router.post("/profiler/start", response_model=ProfilerStatus)
+async def start_profiler(options: ProfilerStartRequest):
+    """开启持续低频采样"""
+    continuous_profiler.start(interval=options.interval, window_seconds=options.window_seconds)
+    return continuous_profiler.status()
+
+@router.post("/profiler/stop", response_model=ProfilerStatus)
+async def stop_profiler():
+    """停止持续采样"""
+    continuous_profiler.stop()
+    return continuous_profiler.status()
+
+@router.get("/profiler/profile", response_class=PlainTextResponse)
+async def download_profile(seconds: Optional[int] = Query(None, ge=1, description="只取最近N秒，默认整个窗口")):
+    """下载滚动窗口内的聚合栈（collapsed格式，可直接生成火焰图）"""
+    return PlainTextResponse(
+        render_collapsed(continuous_profiler.snapshot(seconds)),
+        headers={"Content-Disposition": 'attachment; filename="profile.folded"'}
+    )
+
+@router.get("/profiles", response_model=List[str])
+async def list_request_profiles():
+    """列出最近的单请求profile"""
+    return list(request_profiles.keys())
+
+@router.get("/profiles/{request_id}", response_class=PlainTextResponse)
+async def download_request_profile(request_id: str):
+    """下载单请求profile（collapsed格式）"""
+    profile = get_request_profile(request_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error": {"code": "PROFILE_NOT_FOUND", "message": "Profile not found"}}
+        )
+    return PlainTextResponse(
+        profile,
+        headers={"Content-Disposition": f'attachment; filename="{request_id}.folded"'}
+    )
+
+# 内存接口会遍历整个堆或拍摄快照，用普通def在线程池中执行，不阻塞事件循环
+@router.get("/memory", response_model=MemoryReport)
+def get_memory_report(top: int = Query(25, ge=1, le=500, description="按类型统计的对象数量取前N")):
+    """查看当前worker的RSS、gc统计和按类型的对象数量"""
+    return memory_report(top)
+
+@router.post("/memory/tracemalloc/start", response_model=TracemallocStatus)
+def start_tracemalloc(options: TracemallocStartRequest):
+    """开启tracemalloc（会拖慢内存分配，排查完请关闭）"""
+    start_tracing(options.frames)
+    return {"tracing": True}
+
+@router.post("/memory/tracemalloc/stop", response_model=TracemallocStatus)
+def stop_tracemalloc():
+    """关闭tracemalloc并丢弃快照"""
+    stop_tracing()
+    return {"tracing": False}
+
+@router.get("/memory/snapshots", response_model=List[SnapshotInfo])
+def get_memory_snapshots():
+    """列出已保存的快照"""
+    return list_snapshots()
+
+@router.post("/memory/snapshots", response_model=Snapshot, status_code=status.HTTP_201_CREATED)
+def create_memory_snapshot():
+    """拍摄tracemalloc快照"""
+    try:
+        return take_snapshot()
+    except RuntimeError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"error": {"code": "TRACEMALLOC_NOT_RUNNING", "message": str(exc)}}
+        )
+
+@router.get("/memory/snapshots/diff", response_model=List[SnapshotDiffEntry])
+def get_memory_snapshot_diff(
+    base: int = Query(..., description="基准快照ID"),
+    target: int = Query(..., description="对比快照ID"),
+    top: int = Query(25, ge=1, le=500),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$")
+):
+    """对比两个快照，按增长量排序"""
+    diff = diff_snapshots(base, target, top, group_by)
+    if diff is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error": {"code": "SNAPSHOT_NOT_FOUND", "message": "Snapshot not found"}}
+        )
+    return diff
@@ -8,9 +8,26 @@ from core.security import verify_password, get_password_hash, create_access_toke
 from models.user import User, UserCreate, UserLogin, UserRead
 from schemas.auth import TokenResponse, RefreshRequest
 from api.deps import get_current_active_user
+from core.sessions import (
+    create_family, get_active_family, try_rotate, in_grace_window, revoke_family,
+    remember_rotation, recall_rotation, hash_token, claim_legacy_token, recall_migration
+)
 
 router = APIRouter()
 
+def _issue_tokens(user: User, family_id: str, generation: int) -> TokenResponse:
+    """签发一对令牌，refresh token绑定会话族和代数"""
+    claims = {"sub": user.id, "email": user.email, "token_version": user.token_version}
+    access_token = create_access_token(data=claims)
+    refresh_token = create_refresh_token(data={**claims, "fid": family_id, "gen": generation})
+
+    return TokenResponse(
+        access_token=access_token,
+        refresh_token=refresh_token,
+        token_type="bearer",
+        user=UserRead(id=user.id, email=user.email, created_at=user.created_at)
+    )
+
 @router.post("/signup", response_model=UserRead, status_code=status.HTTP_201_CREATED)
 async def signup(
     user_data: UserCreate,
@@ -55,16 +72,12 @@ async def login(
             headers={"X-Request-ID": getattr(request.state, "request_id", "unknown")}
         )
 
-    # 创建令牌
-    access_token = create_access_token(data={"sub": user.id, "email": user.email, "token_version": user.token_version})
-    refresh_token = create_refresh_token(data={"sub": user.id, "email": user.email, "token_version": user.token_version})
+    # 每次登录开启一个新的会话族
+    family = create_family(session, user.id)
+    response = _issue_tokens(user, family.family_id, family.generation)
+    session.commit()
 
-    return TokenResponse(
-        access_token=access_token,
-        refresh_token=refresh_token,
-        token_type="bearer",
-        user=UserRead(id=user.id, email=user.email, created_at=user.created_at)
-    )
+    return response
 
 @router.post("/refresh", response_model=TokenResponse)
 async def refresh_token(
@@ -83,30 +96,67 @@ async def refresh_token(
 
     user_id = payload.get("sub")
     token_version = payload.get("token_version")
+    revoked = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail={"error": {"code": "TOKEN_REVOKED", "message": "Refresh token has been revoked"}}
+    )
 
-    # 验证用户和token版本
+    # 验证用户和token版本（token_version只用于"全部下线"，刷新不再修改users表）
     user = session.get(User, user_id)
     if not user or user.token_version != token_version:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail={"error": {"code": "TOKEN_REVOKED", "message": "Refresh token has been revoked"}}
-        )
-
-    # 滚动刷新：增加token版本，使旧refresh token失效
-    user.token_version += 1
-    session.add(user)
+        raise revoked
+
+    family_id = payload.get("fid")
+    generation = payload.get("gen")
+
+    # 旧格式的refresh token：迁移到新的会话族，每个旧令牌只能迁移一次
+    if family_id is None:
+        token_hash = hash_token(refresh_data.refresh_token)
+        family = create_family(session, user.id)
+        expires_at = datetime.fromtimestamp(payload["exp"], timezone.utc)
+        if claim_legacy_token(session, token_hash, family.family_id, expires_at):
+            session.commit()
+            response = _issue_tokens(user, family.family_id, family.generation)
+            remember_rotation(family.family_id, 0, response)
+            return response
+
+        # 并发的重复迁移：宽限期内返回同一对令牌，之后视为重放
+        session.rollback()
+        response = recall_migration(session, token_hash)
+        if response is None:
+            raise revoked
+        return response
+
+    family = get_active_family(session, family_id, user.id)
+    if family is None:
+        raise revoked
+
+    # 滚动刷新：只轮换当前会话族
+    if generation == family.generation and try_rotate(session, family, generation):
+        session.commit()
+        response = _issue_tokens(user, family.family_id, family.generation)
+        remember_rotation(family.family_id, generation, response)
+        return response
+
+    # 并发的重复刷新：宽限期内返回同一对令牌
+    if in_grace_window(family, generation):
+        return recall_rotation(family.family_id, generation) or _issue_tokens(user, family.family_id, family.generation)
+
+    # 已轮换过的旧令牌被再次使用，视为泄露，吊销整个会话族
+    revoke_family(session, family.family_id)
     session.commit()
+    raise revoked
 
-    # 创建新令牌
-    access_token = create_access_token(data={"sub": user.id, "email": user.email, "token_version": user.token_version})
-    new_refresh_token = create_refresh_token(data={"sub": user.id, "email": user.email, "token_version": user.token_version})
-
-    return TokenResponse(
-        access_token=access_token,
-        refresh_token=new_refresh_token,
-        token_type="bearer",
-        user=UserRead(id=user.id, email=user.email, created_at=user.created_at)
-    )
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    refresh_data: RefreshRequest,
+    session: Session = Depends(get_session)
+):
+    """退出登录（立即吊销当前会话族）"""
+    payload = verify_token(refresh_data.refresh_token, "refresh")
+    if payload and payload.get("fid"):
+        revoke_family(session, payload["fid"])
+        session.commit()
 
 @router.get("/me", response_model=UserRead)
 async def get_current_user_info(
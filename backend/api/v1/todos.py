@@ -1,13 +1,27 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlmodel import Session, select, and_, or_
 from datetime import datetime, timezone
 from typing import List, Optional
+import json
+import logging
 
-from core.database import get_session
 from models.user import User
-from models.todo import Todo, TodoCreate, TodoUpdate, TodoRead, TodoDeleted
-from api.deps import get_current_active_user
+from models.todo import Todo, TodoCreate, TodoUpdate, TodoRead, TodoDeleted, TodoImportError, TodoImportResult
+from models.stats import TodoStatsRead
+from core.exceptions import APIException
+from core.stats import apply_stats_delta, get_stats
+from api.deps import get_current_active_user, get_todo_session
+from core.sharding import current_placement
 from utils.cursor import encode_cursor, decode_cursor
+from utils.transfer import iter_lines, decode_line, parse_ndjson_line, CsvRecordParser
+
+EXPORT_FETCH_SIZE = 1000
+EXPORT_LINES_PER_CHUNK = 500
+IMPORT_MAX_ERRORS = 100
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -16,7 +30,7 @@ async def get_todos(
     cursor: Optional[str] = Query(None, description="游标令牌"),
     limit: int = Query(50, ge=1, le=200, description="返回条数限制"),
     current_user: User = Depends(get_current_active_user),
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_todo_session)
 ):
     """获取Todo列表（支持增量同步）"""
 
@@ -87,12 +101,163 @@ async def get_todos(
         "has_more": has_more
     }
 
+@router.get("/stats", response_model=TodoStatsRead)
+async def get_todo_stats(
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_todo_session)
+):
+    """获取Todo统计（读取按用户维护的聚合行）"""
+    stats = get_stats(session, current_user.id)
+    return TodoStatsRead(
+        total=stats.total,
+        done=stats.done,
+        open=stats.total - stats.done,
+        last_updated=stats.updated_at
+    )
+
+def _export_lines(engine, user_id: str, include_deleted: bool):
+    """逐批读取并输出NDJSON，内存占用与数据量无关"""
+    where_conditions = [Todo.user_id == user_id]
+    if not include_deleted:
+        where_conditions.append(Todo.deleted_at.is_(None))
+
+    # 只查列而不查ORM实体，避免对象进入identity map
+    query = (
+        select(Todo.id, Todo.title, Todo.done, Todo.created_at, Todo.updated_at, Todo.deleted_at)
+        .where(and_(*where_conditions))
+        .order_by(Todo.updated_at.asc(), Todo.id.asc())
+    )
+
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=EXPORT_FETCH_SIZE).execute(query)
+        lines = []
+        for row in result:
+            if row.deleted_at is not None:
+                record = {"id": row.id, "deleted": True, "updated_at": row.updated_at.isoformat()}
+            else:
+                record = {
+                    "id": row.id,
+                    "title": row.title,
+                    "done": row.done,
+                    "created_at": row.created_at.isoformat(),
+                    "updated_at": row.updated_at.isoformat()
+                }
+            lines.append(json.dumps(record, ensure_ascii=False))
+
+            if len(lines) >= EXPORT_LINES_PER_CHUNK:
+                yield "\n".join(lines) + "\n"
+                lines = []
+
+        if lines:
+            yield "\n".join(lines) + "\n"
+
+@router.get("/export")
+def export_todos(
+    include_deleted: bool = Query(False, description="是否包含已删除的墓碑记录"),
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_todo_session)
+):
+    """导出Todo（NDJSON流式输出）"""
+    return StreamingResponse(
+        _export_lines(session.get_bind(), current_user.id, include_deleted),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="todos.ndjson"'}
+    )
+
+def _insert_batch(session: Session, user_id: str, rows: list):
+    """在一个事务内写入一批Todo"""
+    session.add_all([Todo(title=title, done=done, user_id=user_id) for title, done in rows])
+    apply_stats_delta(session, user_id, total=len(rows), done=sum(1 for _, done in rows if done))
+    session.commit()
+    session.expunge_all()
+
+@router.post("/import", response_model=TodoImportResult)
+async def import_todos(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$", description="上传格式，默认按Content-Type判断"),
+    batch_size: int = Query(500, ge=1, le=5000, description="每个事务写入的条数"),
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_todo_session)
+):
+    """批量导入Todo（NDJSON或CSV，流式解析、分批提交）"""
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "csv" if "csv" in content_type else "ndjson"
+
+    user_id = current_user.id
+    placement = current_placement(user_id)
+    imported = 0
+    failed = 0
+    batches = 0
+    errors = []
+    rows = []
+    csv_parser = CsvRecordParser() if format == "csv" else None
+
+    async def flush():
+        nonlocal imported, batches, rows
+        # 导入可能比分片迁移的宽限期更长：每批提交前确认用户仍在原分片且未在迁移
+        if current_placement(user_id) != placement:
+            raise APIException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                error_code="SHARD_MIGRATING",
+                message="Your data is being moved, import stopped; retry the remaining rows shortly",
+                details={"retryAfter": 2, "imported": imported}
+            )
+        await run_in_threadpool(_insert_batch, session, user_id, rows)
+        imported += len(rows)
+        batches += 1
+        rows = []
+        logger.info("Import progress user=%s batches=%d imported=%d failed=%d", user_id, batches, imported, failed)
+
+    async for line_no, raw in iter_lines(request.stream()):
+        try:
+            line = decode_line(raw)
+            if not line.strip():
+                continue
+
+            if csv_parser is not None and not csv_parser.has_header:
+                try:
+                    csv_parser.parse_header(line)
+                except ValueError as exc:
+                    raise APIException(
+                        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        error_code="VALIDATION_FAILED",
+                        message=str(exc),
+                        details={"field": "title"}
+                    )
+                continue
+
+            row = csv_parser.parse(line) if csv_parser is not None else parse_ndjson_line(line)
+        except ValueError as exc:
+            if csv_parser is not None and not csv_parser.has_header:
+                raise APIException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    error_code="VALIDATION_FAILED",
+                    message=str(exc),
+                    details={"field": "title"}
+                )
+            failed += 1
+            if len(errors) < IMPORT_MAX_ERRORS:
+                errors.append(TodoImportError(line=line_no, message=str(exc)))
+            continue
+
+        if row is None:
+            continue
+        rows.append(row)
+        if len(rows) >= batch_size:
+            await flush()
+
+    if rows:
+        await flush()
+
+    return TodoImportResult(imported=imported, failed=failed, batches=batches, errors=errors)
+
 @router.post("/", response_model=TodoRead, status_code=status.HTTP_201_CREATED)
 async def create_todo(
     todo_data: TodoCreate,
     request: Request,
     current_user: User = Depends(get_current_active_user),
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_todo_session)
 ):
     """创建Todo"""
     todo = Todo(
@@ -101,6 +266,7 @@ async def create_todo(
     )
 
     session.add(todo)
+    apply_stats_delta(session, current_user.id, total=1)
     session.commit()
     session.refresh(todo)
 
@@ -118,7 +284,7 @@ async def update_todo(
     todo_update: TodoUpdate,
     request: Request,
     current_user: User = Depends(get_current_active_user),
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_todo_session)
 ):
     """更新Todo"""
     # 查找Todo
@@ -141,6 +307,7 @@ async def update_todo(
 
     # 更新字段
     update_data = todo_update.model_dump(exclude_unset=True)
+    was_done = todo.done
     if "title" in update_data:
         todo.title = update_data["title"]
     if "done" in update_data:
@@ -150,6 +317,7 @@ async def update_todo(
     todo.update_timestamp()
 
     session.add(todo)
+    apply_stats_delta(session, current_user.id, done=int(todo.done) - int(was_done))
     session.commit()
     session.refresh(todo)
 
@@ -166,7 +334,7 @@ async def delete_todo(
     todo_id: str,
     request: Request,
     current_user: User = Depends(get_current_active_user),
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_todo_session)
 ):
     """删除Todo（软删除）"""
     # 查找Todo
@@ -192,4 +360,5 @@ async def delete_todo(
     todo.update_timestamp()
 
     session.add(todo)
+    apply_stats_delta(session, current_user.id, total=-1, done=-int(todo.done))
     session.commit()
\ No newline at end of file
@@ -0,0 +1,96 @@
+"""Microbenchmark of the middleware stack alone.
+
+Usage (from the backend directory):
+    python benchmarks/middleware.py [--requests 20000]
+
+Drives a trivial endpoint through CORS plus either the old BaseHTTPMiddleware
+request-id hook or RequestContextMiddleware, calling the ASGI app directly so
+no server or socket cost is included.
+"""
+import argparse
+import asyncio
+import sys
+import os
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from core.middleware import RequestContextMiddleware
+
+
+async def endpoint(request):
+    return JSONResponse({"status": "ok"})
+
+
+async def add_request_id(request, call_next):
+    # The hook main.py used before RequestContextMiddleware
+    request_id = str(uuid.uuid4())
+    request.state.request_id = request_id
+    response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+
+def build_app(legacy: bool):
+    app = Starlette(routes=[Route("/ping", endpoint)])
+    app.add_middleware(CORSMiddleware, allow_origins=["http://localhost:5173"], allow_methods=["*"], allow_headers=["*"])
+
+    if legacy:
+        app.add_middleware(BaseHTTPMiddleware, dispatch=add_request_id)
+    else:
+        app.add_middleware(RequestContextMiddleware)
+    return app
+
+
+async def drive(app, count: int) -> float:
+    scope_template = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.4"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/ping",
+        "raw_path": b"/ping",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench"), (b"origin", b"http://localhost:5173")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("127.0.0.1", 8000),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(count):
+        await app(dict(scope_template), receive, send)
+    return time.perf_counter() - started
+
+
+async def run(count: int):
+    for label, legacy in (("BaseHTTPMiddleware", True), ("RequestContextMiddleware", False)):
+        app = build_app(legacy)
+        await drive(app, 500)  # warm up
+        elapsed = await drive(app, count)
+        print(f"{label:>26}: {elapsed / count * 1e6:7.1f} us/request  ({count / elapsed:8.0f} req/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
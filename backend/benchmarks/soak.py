@@ -0,0 +1,140 @@
+"""Soak test: run polling traffic for a long time and assert memory stays flat.
+
+Usage (from the backend directory):
+    python benchmarks/soak.py --duration 7200                 # in-process, this interpreter's RSS
+    python benchmarks/soak.py --url http://localhost:8000 --admin-token ... --duration 14400
+
+Each simulated client keeps syncing with GET /todos using its cursor, reads
+/todos/stats, and now and then creates, toggles or deletes a todo, like the
+frontend does. RSS is sampled every --sample-interval seconds; the baseline
+is taken after --warmup seconds and the run fails (exit code 1) when the
+final RSS is more than --max-growth-mb above it.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class InProcessTarget:
+    def __init__(self):
+        from fastapi.testclient import TestClient
+        from core.database import get_engine
+        from core.memory import rss_bytes
+        import main
+
+        get_engine().echo = False
+        self.client = TestClient(main.app)
+        self.client.__enter__()
+        self.rss = rss_bytes
+
+    def close(self):
+        self.client.__exit__(None, None, None)
+
+
+class RemoteTarget:
+    def __init__(self, url: str, admin_token: str):
+        import httpx
+
+        self.client = httpx.Client(base_url=url, timeout=30)
+        self.admin_headers = {"X-Admin-Token": admin_token}
+
+    def rss(self) -> int:
+        # Only the worker that answers is measured; run the server with one worker
+        response = self.client.get("/api/v1/admin/memory", params={"top": 1}, headers=self.admin_headers)
+        response.raise_for_status()
+        return response.json()["rss_bytes"]
+
+    def close(self):
+        self.client.close()
+
+
+class SimulatedClient:
+    def __init__(self, http):
+        self.http = http
+        credentials = {"email": f"soak-{uuid.uuid4().hex[:12]}@example.com", "password": "soak-password"}
+        http.post("/api/v1/auth/signup", json=credentials).raise_for_status()
+        tokens = http.post("/api/v1/auth/login", json=credentials).json()
+        self.headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        self.refresh_token = tokens["refresh_token"]
+        self.cursor = None
+        self.todo_ids = []
+
+    def step(self):
+        roll = random.random()
+        if roll < 0.05:
+            todo = self.http.post("/api/v1/todos/", json={"title": f"soak {uuid.uuid4().hex[:8]}"}, headers=self.headers).json()
+            self.todo_ids.append(todo["id"])
+        elif roll < 0.08 and self.todo_ids:
+            self.http.patch(f"/api/v1/todos/{random.choice(self.todo_ids)}", json={"done": random.random() < 0.5}, headers=self.headers)
+        elif roll < 0.10 and self.todo_ids:
+            self.http.delete(f"/api/v1/todos/{self.todo_ids.pop()}", headers=self.headers)
+        elif roll < 0.11:
+            tokens = self.http.post("/api/v1/auth/refresh", json={"refresh_token": self.refresh_token}).json()
+            self.headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+            self.refresh_token = tokens["refresh_token"]
+        elif roll < 0.20:
+            self.http.get("/api/v1/todos/stats", headers=self.headers)
+        else:
+            params = {"cursor": self.cursor} if self.cursor else {}
+            page = self.http.get("/api/v1/todos/", params=params, headers=self.headers).json()
+            self.cursor = page["next_cursor"] or self.cursor
+        # An unauthenticated poll exercises the exception handlers
+        if roll > 0.99:
+            self.http.get("/api/v1/todos/")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=3600, help="seconds")
+    parser.add_argument("--warmup", type=float, default=60, help="seconds before the baseline is taken")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--sample-interval", type=float, default=30)
+    parser.add_argument("--max-growth-mb", type=float, default=20)
+    parser.add_argument("--url", help="soak a running server instead of an in-process app")
+    parser.add_argument("--admin-token", default=os.environ.get("ADMIN_TOKEN", ""))
+    args = parser.parse_args()
+
+    target = RemoteTarget(args.url, args.admin_token) if args.url else InProcessTarget()
+    clients = [SimulatedClient(target.client) for _ in range(args.clients)]
+
+    started = time.monotonic()
+    next_sample = started
+    baseline = None
+    requests = 0
+    try:
+        while time.monotonic() - started < args.duration:
+            random.choice(clients).step()
+            requests += 1
+
+            now = time.monotonic()
+            if now >= next_sample:
+                rss_mb = target.rss() / 1024 / 1024
+                if baseline is None and now - started >= args.warmup:
+                    baseline = rss_mb
+                growth = f"{rss_mb - baseline:+.1f} MB" if baseline is not None else "warming up"
+                print(f"{now - started:8.0f}s  {requests:9d} requests  rss {rss_mb:8.1f} MB  {growth}", flush=True)
+                next_sample = now + args.sample_interval
+
+        final = target.rss() / 1024 / 1024
+    finally:
+        target.close()
+
+    if baseline is None:
+        print("run shorter than warmup, no verdict")
+        return 0
+    growth = final - baseline
+    print(f"baseline {baseline:.1f} MB, final {final:.1f} MB, growth {growth:+.1f} MB over {requests} requests")
+    if growth > args.max_growth_mb:
+        print(f"FAIL: memory grew more than {args.max_growth_mb} MB")
+        return 1
+    print("OK: memory stayed flat")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
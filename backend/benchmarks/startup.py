@@ -0,0 +1,63 @@
+"""Measure import and startup time of the backend.
+
+Usage (from the backend directory):
+    python benchmarks/startup.py [--runs 5]
+
+Each run happens in a fresh interpreter so module caches do not skew the result.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import asyncio, json, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+
+async def startup():
+    async with main.lifespan(main.app):
+        pass
+
+asyncio.run(startup())
+t2 = time.perf_counter()
+print(json.dumps({
+    "import": t1 - t0,
+    "startup": t2 - t1,
+    "schema_migrated": main.app.state.schema_migrated,
+}))
+"""
+
+
+def run_once() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = [run_once() for _ in range(args.runs)]
+    for key in ("import", "startup"):
+        values = [s[key] * 1000 for s in samples]
+        print(f"{key:>8}: median {statistics.median(values):7.1f} ms  "
+              f"min {min(values):7.1f} ms  max {max(values):7.1f} ms")
+    migrated = sum(1 for s in samples if s["schema_migrated"])
+    print(f"schema migrated in {migrated}/{len(samples)} runs")
+
+
+if __name__ == "__main__":
+    main()
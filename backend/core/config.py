@@ -9,11 +9,37 @@ class Settings(BaseSettings):
     # Database
     database_url: str = "sqlite:///./data/todo.db"
 
+    # Sharding (shard 0 is database_url, the others use the template)
+    shard_count: int = 1
+    shard_url_template: str = "sqlite:///./data/todo-shard-{index}.db"
+
     # JWT
     secret_key: str = "your-secret-key"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 60
     refresh_token_expire_days: int = 7
+    # Duplicate refreshes of the same token within this window get the same rotated pair
+    refresh_grace_seconds: int = 10
+
+    # Admin endpoints are disabled while the token is empty
+    admin_token: str = ""
+
+    # Profiling
+    profiler_autostart: bool = False
+    profiler_interval: float = 0.1
+    profiler_window_seconds: int = 600
+
+    # Background jobs
+    job_runner_enabled: bool = True
+    job_workers: int = 2
+    job_poll_interval: float = 1.0
+    job_lease_seconds: int = 300
+    # Hour of day (UTC) for scheduled maintenance jobs
+    maintenance_hour: int = 3
+
+    # Recycle a worker once its RSS exceeds this many MB (0 disables). Needs a supervisor
+    # running several workers; with the single-process Dockerfile the container just exits
+    memory_budget_mb: int = 0
 
     # CORS
     cors_origins: List[str] = ["http://localhost:5173"]
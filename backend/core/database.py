@@ -1,37 +1,141 @@
 from sqlmodel import create_engine, SQLModel, Session
-from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy import text
 import os
+import threading
 
 from core.config import settings
 
-# Ensure data directory exists
-os.makedirs(os.path.dirname(settings.database_url.replace("sqlite:///", "")), exist_ok=True)
+# Bump whenever a table is added so existing databases create it on next startup.
+# create_all only creates missing tables; new columns on existing tables need a manual migration
+SCHEMA_VERSION = 7
 
-# Sync engine (for initialization)
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False},  # SQLite specific config
-    echo=True  # Show SQL during development
-)
+_engine = None
+_async_engine = None
+_engine_lock = threading.Lock()
+_warmed_up = set()
 
-# Async engine
-async_engine = create_async_engine(
-    settings.database_url.replace("sqlite:///", "sqlite+aiosqlite:///"),
-    connect_args={"check_same_thread": False},
-    echo=True
-)
 
-def create_db_and_tables():
-    """Create database tables"""
-    SQLModel.metadata.create_all(engine)
+def create_sqlite_engine(database_url: str):
+    """Create a sync engine for a SQLite database url"""
+    db_path = database_url.replace("sqlite:///", "")
+    data_dir = os.path.dirname(db_path)
+    if data_dir:
+        os.makedirs(data_dir, exist_ok=True)
+
+    return create_engine(
+        database_url,
+        connect_args={"check_same_thread": False},  # SQLite specific config
+        echo=True  # Show SQL during development
+    )
+
+
+def get_engine():
+    """Get the sync engine, creating it on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_sqlite_engine(settings.database_url)
+    return _engine
+
+
+def get_async_engine():
+    """Get the async engine, creating it on first use"""
+    global _async_engine
+    if _async_engine is None:
+        # Deferred so the aiosqlite/greenlet stack is only imported when needed
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        with _engine_lock:
+            if _async_engine is None:
+                get_engine()  # makes sure the data directory exists
+                _async_engine = create_async_engine(
+                    settings.database_url.replace("sqlite:///", "sqlite+aiosqlite:///"),
+                    connect_args={"check_same_thread": False},
+                    echo=True
+                )
+    return _async_engine
+
+
+def __getattr__(name):
+    # Keep `from core.database import engine` working without eager construction
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_schema_version(engine=None) -> int:
+    """Read the schema version stored in the SQLite header"""
+    with (engine or get_engine()).connect() as conn:
+        return conn.exec_driver_sql("PRAGMA user_version").scalar() or 0
+
+
+def create_db_and_tables(engine=None, tables=None) -> bool:
+    """Create database tables, skipped when the schema version already matches"""
+    from models import load_all_models
+
+    # The version stamp must mean every table exists, whatever the caller happened to import
+    load_all_models()
+    engine = engine or get_engine()
+    if get_schema_version(engine) == SCHEMA_VERSION:
+        return False
+
+    SQLModel.metadata.create_all(engine, tables=tables)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return True
+
+
+def check_database(engine=None, probe: str = "SELECT 1") -> bool:
+    """Check that the database accepts queries"""
+    try:
+        with (engine or get_engine()).connect() as conn:
+            conn.execute(text(probe))
+        return True
+    except Exception:
+        return False
+
+
+def warm_up(engine=None):
+    """Compile and run the hot-path statements once so the first real request is not slower.
+
+    Without an engine the primary database is warmed, including the users
+    table; with a shard engine only the todo statements are run.
+    """
+    primary = engine is None
+    engine = engine or get_engine()
+    if id(engine) in _warmed_up:
+        return
+
+    from sqlmodel import select, and_
+    from models.user import User
+    from models.todo import Todo
+    from models.stats import TodoStats
+
+    with Session(engine) as session:
+        if primary:
+            session.get(User, "")
+        session.get(TodoStats, "")
+        session.exec(
+            select(Todo)
+            .where(and_(Todo.user_id == "", Todo.deleted_at.is_(None)))
+            .order_by(Todo.updated_at.asc(), Todo.id.asc())
+            .limit(1)
+        ).all()
+    _warmed_up.add(id(engine))
+
 
 def get_session():
     """Get database session"""
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         yield session
 
+
 async def get_async_session():
     """Get async database session"""
-    async with AsyncSession(async_engine) as session:
-        yield session
\ No newline at end of file
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    async with AsyncSession(get_async_engine()) as session:
+        yield session
@@ -2,7 +2,7 @@ from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
-import uuid
+from core.middleware import new_request_id
 
 class APIException(Exception):
     """自定义API异常"""
@@ -14,7 +14,7 @@ class APIException(Exception):
 
 async def api_exception_handler(request: Request, exc: APIException):
     """处理自定义API异常"""
-    request_id = getattr(request.state, "request_id", str(uuid.uuid4()))
+    request_id = getattr(request.state, "request_id", new_request_id())
 
     return JSONResponse(
         status_code=exc.status_code,
@@ -31,7 +31,7 @@ async def api_exception_handler(request: Request, exc: APIException):
 
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """处理请求验证异常"""
-    request_id = getattr(request.state, "request_id", str(uuid.uuid4()))
+    request_id = getattr(request.state, "request_id", new_request_id())
 
     # 提取第一个错误信息
     errors = exc.errors()
@@ -56,7 +56,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
     """处理HTTP异常"""
-    request_id = getattr(request.state, "request_id", str(uuid.uuid4()))
+    request_id = getattr(request.state, "request_id", new_request_id())
 
     # 如果已经是标准格式，直接返回
     if isinstance(exc.detail, dict) and "error" in exc.detail:
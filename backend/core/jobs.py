@@ -0,0 +1,273 @@
+"""基于主库jobs表的持久化后台任务：随调用方事务入队，CAS认领，失败指数退避重试"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone, timedelta
+from typing import Callable, Dict, Optional
+import json
+import logging
+import random
+import threading
+
+from sqlalchemy import update, delete
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session, select
+
+from core.config import settings
+from core.database import get_engine
+from models.job import Job
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 3600
+DONE_RETENTION_DAYS = 7
+
+_handlers: Dict[str, Callable[[dict], None]] = {}
+
+
+def job_handler(kind: str):
+    """Register a function as the handler of a job kind.
+
+    A job may run more than once (crash after the work, before it is marked
+    done), so handlers must be idempotent.
+    """
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(
+    session: Session,
+    kind: str,
+    payload: Optional[dict] = None,
+    key: Optional[str] = None,
+    run_at: Optional[datetime] = None,
+    max_attempts: int = 5
+):
+    """Add a job in the caller's transaction (the caller commits).
+
+    With a key, enqueueing the same job again is a no-op. `session` must be
+    bound to the primary database; shard sessions raise ValueError.
+    """
+    if session.get_bind() is not get_engine():
+        raise ValueError("Jobs can only be enqueued with a session on the primary database")
+
+    now = datetime.now(timezone.utc)
+    statement = insert(Job).values(
+        kind=kind,
+        key=key,
+        payload=json.dumps(payload or {}),
+        status="pending",
+        attempts=0,
+        max_attempts=max_attempts,
+        run_at=run_at or now,
+        created_at=now,
+        updated_at=now
+    )
+    if key is not None:
+        statement = statement.on_conflict_do_nothing(index_elements=[Job.key])
+    session.execute(statement)
+
+
+def backoff_delay(attempts: int) -> float:
+    """Exponential backoff with jitter, in seconds"""
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class JobRunner:
+    """Polls the jobs table and runs due jobs on a bounded thread pool"""
+
+    def __init__(self, workers: int = None, poll_interval: float = None):
+        self.workers = workers or settings.job_workers
+        self.poll_interval = poll_interval or settings.job_poll_interval
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job-worker")
+        self._thread = threading.Thread(target=self._loop, name="job-runner", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop claiming and wait for running jobs to finish"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+        self._thread = None
+
+    def wake(self):
+        """Poll right away instead of waiting for the next interval"""
+        self._wake.set()
+
+    def _loop(self):
+        last_maintenance_check = None
+        last_recovery = None
+        while not self._stop.is_set():
+            try:
+                now = datetime.now(timezone.utc)
+                if last_maintenance_check is None or now - last_maintenance_check > timedelta(hours=1):
+                    schedule_maintenance()
+                    last_maintenance_check = now
+
+                # A lease cannot expire faster than it lasts, so checking once per lease is enough
+                if last_recovery is None or now - last_recovery >= timedelta(seconds=settings.job_lease_seconds):
+                    recover_stale_jobs()
+                    last_recovery = now
+
+                while self._slots.acquire(blocking=False):
+                    try:
+                        job = claim_next_job()
+                        if job is not None:
+                            self._executor.submit(self._run_and_release, job)
+                    except Exception:
+                        # Give the slot back, otherwise every failed claim shrinks the pool for good
+                        self._slots.release()
+                        raise
+                    if job is None:
+                        self._slots.release()
+                        break
+            except Exception:
+                logger.exception("Job runner poll failed")
+
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _run_and_release(self, job: Job):
+        try:
+            run_job(job)
+        finally:
+            self._slots.release()
+
+    def run_pending(self) -> int:
+        """Run every due job in the calling thread (maintenance scripts and tests)"""
+        ran = 0
+        while True:
+            job = claim_next_job()
+            if job is None:
+                return ran
+            run_job(job)
+            ran += 1
+
+
+def claim_next_job() -> Optional[Job]:
+    """Atomically move the next due job from pending to running"""
+    now = datetime.now(timezone.utc)
+    with Session(get_engine()) as session:
+        while True:
+            job = session.exec(
+                select(Job)
+                .where(Job.status == "pending", Job.run_at <= now)
+                .order_by(Job.run_at, Job.id)
+                .limit(1)
+            ).first()
+            if job is None:
+                return None
+
+            result = session.execute(
+                update(Job)
+                .where(Job.id == job.id, Job.status == "pending")
+                .values(status="running", attempts=Job.attempts + 1, locked_at=now, updated_at=now)
+            )
+            session.commit()
+            if result.rowcount == 1:
+                session.refresh(job)
+                session.expunge(job)
+                return job
+            # Another worker claimed it first; try the next one
+
+
+def run_job(job: Job):
+    """Run a claimed job and record the outcome"""
+    handler = _handlers.get(job.kind)
+    error = None
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job kind '{job.kind}'")
+        handler(json.loads(job.payload))
+    except Exception as exc:
+        logger.exception("Job %s (%s) failed on attempt %d", job.id, job.kind, job.attempts)
+        error = f"{type(exc).__name__}: {exc}"
+
+    now = datetime.now(timezone.utc)
+    if error is None:
+        values = {"status": "done", "last_error": None}
+    elif job.attempts < job.max_attempts:
+        values = {"status": "pending", "last_error": error, "run_at": now + timedelta(seconds=backoff_delay(job.attempts))}
+    else:
+        values = {"status": "failed", "last_error": error}
+
+    with Session(get_engine()) as session:
+        session.execute(
+            update(Job)
+            .where(Job.id == job.id)
+            .values(locked_at=None, updated_at=now, **values)
+        )
+        session.commit()
+
+
+def recover_stale_jobs() -> int:
+    """Requeue jobs whose worker died mid-run (lease expired)"""
+    expired = datetime.now(timezone.utc) - timedelta(seconds=settings.job_lease_seconds)
+    with Session(get_engine()) as session:
+        result = session.execute(
+            update(Job)
+            .where(Job.status == "running", Job.locked_at < expired)
+            .values(status="pending", locked_at=None, last_error="Lease expired")
+        )
+        session.commit()
+        return result.rowcount
+
+
+def next_maintenance_time(now: Optional[datetime] = None) -> datetime:
+    """Next occurrence of the configured off-peak hour"""
+    now = now or datetime.now(timezone.utc)
+    run_at = now.replace(hour=settings.maintenance_hour, minute=0, second=0, microsecond=0)
+    if run_at <= now:
+        run_at += timedelta(days=1)
+    return run_at
+
+
+def schedule_maintenance():
+    """Make sure tonight's maintenance jobs exist; dated keys keep it idempotent across workers"""
+    run_at = next_maintenance_time()
+    with Session(get_engine()) as session:
+        for kind in ("stats.repair", "sessions.purge", "jobs.purge"):
+            enqueue(session, kind, key=f"maintenance:{kind}:{run_at.date().isoformat()}", run_at=run_at)
+        session.commit()
+
+
+@job_handler("stats.repair")
+def _repair_stats(payload: dict):
+    from core.sharding import get_shard_engine
+    from core.stats import repair_stats
+
+    for index in range(settings.shard_count):
+        repair_stats(get_shard_engine(index), batch_size=payload.get("batch_size", 500))
+
+
+@job_handler("sessions.purge")
+def _purge_sessions(payload: dict):
+    from core.sessions import purge_expired_families
+
+    with Session(get_engine()) as session:
+        purge_expired_families(session)
+        session.commit()
+
+
+@job_handler("jobs.purge")
+def _purge_jobs(payload: dict):
+    cutoff = datetime.now(timezone.utc) - timedelta(days=DONE_RETENTION_DAYS)
+    with Session(get_engine()) as session:
+        session.execute(delete(Job).where(Job.status == "done", Job.updated_at < cutoff))
+        session.commit()
+
+
+job_runner = JobRunner()
@@ -0,0 +1,179 @@
+"""当前worker进程的内存统计、tracemalloc快照对比和可选的内存预算"""
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+from typing import Optional
+import gc
+import itertools
+import logging
+import os
+import signal
+import sys
+import threading
+import tracemalloc
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_SNAPSHOTS = 5
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        # No procfs (macOS): fall back to the peak, which is what getrusage offers
+        try:
+            import resource  # POSIX only, so not imported at module level
+        except ImportError:
+            return 0  # Windows development machines: no budget enforcement
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def gc_summary() -> dict:
+    return {
+        "counts": list(gc.get_count()),
+        "thresholds": list(gc.get_threshold()),
+        "generations": gc.get_stats(),
+        "garbage": len(gc.garbage)
+    }
+
+
+def object_counts() -> Counter:
+    """Live gc-tracked objects grouped by type"""
+    return Counter(type(obj).__qualname__ for obj in gc.get_objects())
+
+
+def memory_report(top: int = 25) -> dict:
+    counts = object_counts()
+    return {
+        "pid": os.getpid(),
+        "rss_bytes": rss_bytes(),
+        "budget_bytes": settings.memory_budget_mb * 1024 * 1024 or None,
+        "gc": gc_summary(),
+        "tracked_objects": sum(counts.values()),
+        "objects": [{"type": name, "count": count} for name, count in counts.most_common(top)],
+        "tracemalloc": tracemalloc.is_tracing()
+    }
+
+
+# tracemalloc snapshots, keyed by id, oldest evicted first
+_snapshots: "OrderedDict[int, tuple]" = OrderedDict()
+_snapshot_ids = itertools.count(1)
+_snapshot_lock = threading.Lock()
+
+
+def start_tracing(frames: int = 10):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def stop_tracing():
+    """Stop tracing and drop the snapshots, which are useless without it"""
+    tracemalloc.stop()
+    with _snapshot_lock:
+        _snapshots.clear()
+
+
+def _filtered(snapshot):
+    return snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+
+
+def take_snapshot() -> dict:
+    """Take a tracemalloc snapshot and keep it for later diffs"""
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc is not running")
+
+    snapshot = _filtered(tracemalloc.take_snapshot())
+    taken_at = datetime.now(timezone.utc)
+    with _snapshot_lock:
+        snapshot_id = next(_snapshot_ids)
+        _snapshots[snapshot_id] = (taken_at, snapshot)
+        while len(_snapshots) > MAX_SNAPSHOTS:
+            _snapshots.popitem(last=False)
+
+    current, peak = tracemalloc.get_traced_memory()
+    return {"id": snapshot_id, "taken_at": taken_at, "traced_bytes": current, "peak_bytes": peak}
+
+
+def list_snapshots() -> list:
+    with _snapshot_lock:
+        return [{"id": snapshot_id, "taken_at": taken_at} for snapshot_id, (taken_at, _) in _snapshots.items()]
+
+
+def diff_snapshots(base_id: int, target_id: int, top: int = 25, group_by: str = "lineno") -> Optional[list]:
+    """Largest allocation growth between two snapshots"""
+    with _snapshot_lock:
+        base = _snapshots.get(base_id)
+        target = _snapshots.get(target_id)
+    if base is None or target is None:
+        return None
+
+    stats = target[1].compare_to(base[1], group_by)
+    return [
+        {
+            "location": str(stat.traceback),
+            "size_diff": stat.size_diff,
+            "size": stat.size,
+            "count_diff": stat.count_diff,
+            "count": stat.count
+        }
+        for stat in stats[:top]
+    ]
+
+
+class MemoryWatchdog:
+    """Recycles the worker once its RSS exceeds MEMORY_BUDGET_MB.
+
+    The worker stops reporting ready, then sends itself SIGTERM so uvicorn
+    shuts down gracefully. Something else has to start a replacement: only
+    enable the budget under a supervisor running several workers (gunicorn
+    with uvicorn workers, or several replicas behind a load balancer). The
+    shipped Dockerfile runs a single uvicorn process, where recycling means
+    the container exits and serves nothing until it is restarted.
+    """
+
+    def __init__(self, interval: float = 30.0, drain_seconds: float = 10.0):
+        self.interval = interval
+        self.drain_seconds = drain_seconds
+        self.draining = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if not settings.memory_budget_mb or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="memory-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+    def over_budget(self) -> bool:
+        return rss_bytes() > settings.memory_budget_mb * 1024 * 1024
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            if not self.over_budget():
+                continue
+            logger.warning(
+                "Worker %d RSS %d bytes exceeds budget of %d MB, recycling",
+                os.getpid(), rss_bytes(), settings.memory_budget_mb
+            )
+            self.draining = True
+            if not self._stop.wait(self.drain_seconds):
+                os.kill(os.getpid(), signal.SIGTERM)
+            return
+
+
+memory_watchdog = MemoryWatchdog()
@@ -0,0 +1,52 @@
+from collections import Counter
+from typing import Tuple
+
+
+class RequestMetrics:
+    """进程内请求指标（只在事件循环线程中更新，无需加锁）"""
+
+    BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.requests = Counter()
+        self.bucket_counts = [0] * len(self.BUCKETS)
+        self.duration_sum = 0.0
+        self.duration_count = 0
+        self.in_flight = 0
+
+    def observe(self, method: str, status_code: int, duration: float):
+        """记录一次请求"""
+        self.requests[(method, status_code)] += 1
+        self.duration_sum += duration
+        self.duration_count += 1
+        for index, bound in enumerate(self.BUCKETS):
+            if duration <= bound:
+                self.bucket_counts[index] += 1
+                break
+
+    def render(self) -> str:
+        """以Prometheus文本格式输出"""
+        lines = [
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, status_code), count in sorted(self.requests.items()):
+            lines.append(f'http_requests_total{{method="{method}",status="{status_code}"}} {count}')
+
+        lines.append("# TYPE http_request_duration_seconds histogram")
+        cumulative = 0
+        for bound, count in zip(self.BUCKETS, self.bucket_counts):
+            cumulative += count
+            lines.append(f'http_request_duration_seconds_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'http_request_duration_seconds_bucket{{le="+Inf"}} {self.duration_count}')
+        lines.append(f"http_request_duration_seconds_sum {self.duration_sum}")
+        lines.append(f"http_request_duration_seconds_count {self.duration_count}")
+
+        lines.append("# TYPE http_requests_in_flight gauge")
+        lines.append(f"http_requests_in_flight {self.in_flight}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = RequestMetrics()
@@ -0,0 +1,87 @@
+import itertools
+import json
+import logging
+import os
+import time
+
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_REQUEST_ID_HEADER = b"x-request-id"
+_prefix = os.urandom(4).hex()
+_counter = itertools.count(1)
+
+
+def _reseed():
+    global _prefix, _counter
+    _prefix = os.urandom(4).hex()
+    _counter = itertools.count(1)
+
+
+# 预加载后fork出的worker需要各自的前缀（Windows没有fork）
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reseed)
+
+
+def new_request_id() -> str:
+    """生成请求ID：进程随机前缀+自增序号，比uuid4便宜且不会重复"""
+    return f"{_prefix}-{next(_counter):x}"
+
+
+class RequestContextMiddleware:
+    """纯ASGI中间件：一次完成请求ID、计时、指标和未处理异常的错误映射"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = new_request_id()
+        scope.setdefault("state", {})["request_id"] = request_id
+        request_id_bytes = request_id.encode("latin-1")
+        started = time.perf_counter()
+        status_code = 500
+        response_started = False
+
+        async def send_wrapper(message):
+            nonlocal status_code, response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                status_code = message["status"]
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                headers = [item for item in message.get("headers", ()) if item[0] != _REQUEST_ID_HEADER]
+                headers.append((_REQUEST_ID_HEADER, request_id_bytes))
+                headers.append((b"server-timing", f"app;dur={elapsed_ms:.2f}".encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        metrics.in_flight += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            logger.exception("Unhandled error in request %s", request_id)
+            if response_started:
+                raise
+            body = json.dumps({
+                "error": {
+                    "code": "INTERNAL_SERVER_ERROR",
+                    "message": "An unexpected error occurred"
+                },
+                "requestId": request_id
+            }).encode("utf-8")
+            await send_wrapper({
+                "type": "http.response.start",
+                "status": 500,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+        finally:
+            metrics.in_flight -= 1
+            metrics.observe(scope["method"], status_code, time.perf_counter() - started)
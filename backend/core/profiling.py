@@ -0,0 +1,236 @@
+"""采样式性能分析，输出flamegraph/speedscope可读的collapsed stacks"""
+from collections import Counter, OrderedDict, deque
+import os
+import secrets
+import sys
+import threading
+import time
+from typing import Optional
+
+from core.config import settings
+
+MAX_STACK_DEPTH = 128
+MAX_REQUEST_PROFILES = 20
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+# Background threads of this service that would only add noise to every profile
+IGNORED_THREAD_PREFIXES = ("continuous-profiler", "request-profiler", "job-runner", "memory-watchdog")
+
+# Leaf frames of a thread that is blocked waiting rather than doing work
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    (os.path.join("concurrent", "futures", "thread.py"), "_worker"),  # blocked in SimpleQueue.get
+}
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return any(code.co_name == name and code.co_filename.endswith(os.sep + path) for path, name in IDLE_FRAMES)
+
+
+def collect_stacks(skip_thread_ids=(), keep_thread_ids=()) -> list:
+    """Take one sample of every busy thread, as collapsed stack strings.
+
+    Idle threads and the service's own background threads are left out,
+    except for threads in `keep_thread_ids`.
+    """
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    stacks = []
+    for thread_id, frame in sys._current_frames().items():
+        if thread_id in skip_thread_ids:
+            continue
+        name = names.get(thread_id, str(thread_id))
+        if thread_id not in keep_thread_ids and (name.startswith(IGNORED_THREAD_PREFIXES) or _is_idle(frame)):
+            continue
+        labels = []
+        while frame is not None and len(labels) < MAX_STACK_DEPTH:
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        labels.append(name)
+        labels.reverse()
+        stacks.append(";".join(labels))
+    return stacks
+
+
+def render_collapsed(stacks: Counter) -> str:
+    """Render aggregated stacks in collapsed format"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class _SamplerThread(threading.Thread):
+    def __init__(self, interval: float, on_sample, name: str, keep_thread_ids=()):
+        super().__init__(name=name, daemon=True)
+        self.interval = interval
+        self.on_sample = on_sample
+        self.keep_thread_ids = keep_thread_ids
+        self.stop_event = threading.Event()
+
+    def run(self):
+        skip = (threading.get_ident(),)
+        # Sample right away, so work shorter than one interval still shows up
+        while True:
+            self.on_sample(collect_stacks(skip, self.keep_thread_ids))
+            if self.stop_event.wait(self.interval):
+                return
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+
+class ContinuousProfiler:
+    """Always-on low-rate sampler keeping a rolling window of aggregated stacks"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[_SamplerThread] = None
+        self._buckets = deque()
+        self.interval = settings.profiler_interval
+        self.window_seconds = settings.profiler_window_seconds
+        self.bucket_seconds = 60
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, interval: Optional[float] = None, window_seconds: Optional[int] = None):
+        """Start sampling in this worker (restarts with new settings if running)"""
+        self.stop()
+        if interval is not None:
+            self.interval = interval
+        if window_seconds is not None:
+            self.window_seconds = window_seconds
+        self.bucket_seconds = max(1, min(60, self.window_seconds // 10))
+        self._thread = _SamplerThread(self.interval, self._record, name="continuous-profiler")
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling; the collected window is kept until the next start"""
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.stop()
+
+    def _record(self, stacks: list):
+        now = time.time()
+        bucket_start = now - now % self.bucket_seconds
+        with self._lock:
+            if not self._buckets or self._buckets[-1][0] != bucket_start:
+                self._buckets.append((bucket_start, Counter()))
+            self._buckets[-1][1].update(stacks)
+            while self._buckets and self._buckets[0][0] <= now - self.window_seconds:
+                self._buckets.popleft()
+
+    def snapshot(self, seconds: Optional[int] = None) -> Counter:
+        """Merge the buckets of the last `seconds` (default: whole window)"""
+        since = time.time() - (seconds or self.window_seconds)
+        merged = Counter()
+        with self._lock:
+            for bucket_start, stacks in self._buckets:
+                if bucket_start + self.bucket_seconds > since:
+                    merged.update(stacks)
+        return merged
+
+    def status(self) -> dict:
+        with self._lock:
+            samples = sum(sum(stacks.values()) for _, stacks in self._buckets)
+        return {
+            "running": self.running,
+            "pid": os.getpid(),
+            "interval": self.interval,
+            "window_seconds": self.window_seconds,
+            "samples": samples
+        }
+
+
+class RequestProfiler:
+    """Samples all threads at a high rate for the duration of one request.
+
+    The thread that enters the profiler (the one serving the request) is
+    always sampled, even while it waits, so a short request is never empty.
+    """
+
+    def __init__(self, interval: float = 0.001):
+        self.stacks = Counter()
+        self.interval = interval
+        self._thread: Optional[_SamplerThread] = None
+
+    def __enter__(self):
+        self._thread = _SamplerThread(
+            self.interval, self.stacks.update, name="request-profiler", keep_thread_ids=(threading.get_ident(),)
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._thread.stop()
+        return False
+
+
+continuous_profiler = ContinuousProfiler()
+
+# Most recent per-request profiles, keyed by request id
+request_profiles: "OrderedDict[str, str]" = OrderedDict()
+_profiles_lock = threading.Lock()
+
+
+def save_request_profile(request_id: str, stacks: Counter):
+    with _profiles_lock:
+        request_profiles[request_id] = render_collapsed(stacks)
+        while len(request_profiles) > MAX_REQUEST_PROFILES:
+            request_profiles.popitem(last=False)
+
+
+def get_request_profile(request_id: str) -> Optional[str]:
+    with _profiles_lock:
+        return request_profiles.get(request_id)
+
+
+class ProfilingMiddleware:
+    """Profiles requests sent with ``X-Profile: 1`` and a valid ``X-Admin-Token``.
+
+    Only installed when an admin token is configured. Must sit inside
+    RequestContextMiddleware so the request id is already assigned.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wants_profile(scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = scope["state"]["request_id"]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", ())) + [(b"x-profile-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        profiler = RequestProfiler()
+        with profiler:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                save_request_profile(request_id, profiler.stacks)
+
+
+def _wants_profile(headers) -> bool:
+    profile = token = None
+    for key, value in headers:
+        if key == b"x-profile":
+            profile = value
+        elif key == b"x-admin-token":
+            token = value
+    if profile != b"1" or token is None:
+        return False
+    return secrets.compare_digest(token, settings.admin_token.encode("utf-8"))
@@ -0,0 +1,126 @@
+"""refresh token会话族：按会话族滚动刷新，并发重复刷新在宽限期内返回同一对令牌"""
+from datetime import datetime, timezone, timedelta
+from typing import Optional
+import hashlib
+import threading
+import time
+
+from sqlalchemy import update, delete
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session
+
+from core.config import settings
+from models.session import RefreshSession, MigratedRefreshToken
+
+MAX_GRACE_ENTRIES = 10000
+
+_grace_cache = {}
+_grace_lock = threading.Lock()
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands datetimes back naive; they are stored in UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def create_family(session: Session, user_id: str) -> RefreshSession:
+    """Start a new refresh-token family (the caller commits)"""
+    family = RefreshSession(
+        user_id=user_id,
+        expires_at=datetime.now(timezone.utc) + timedelta(days=settings.refresh_token_expire_days)
+    )
+    session.add(family)
+    return family
+
+
+def get_active_family(session: Session, family_id: str, user_id: str) -> Optional[RefreshSession]:
+    """Load a family that is neither revoked, expired nor owned by someone else"""
+    family = session.get(RefreshSession, family_id)
+    if family is None or family.revoked or family.user_id != user_id:
+        return None
+    if _as_utc(family.expires_at) < datetime.now(timezone.utc):
+        return None
+    return family
+
+
+def try_rotate(session: Session, family: RefreshSession, generation: int) -> bool:
+    """Advance the family to the next generation if it is still at `generation` (the caller commits).
+
+    Compare-and-swap, so two workers rotating the same token cannot both win.
+    """
+    result = session.execute(
+        update(RefreshSession)
+        .where(RefreshSession.family_id == family.family_id, RefreshSession.generation == generation)
+        .values(generation=generation + 1, rotated_at=datetime.now(timezone.utc))
+    )
+    session.refresh(family)
+    return result.rowcount == 1
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def claim_legacy_token(session: Session, token_hash: str, family_id: str, expires_at: datetime) -> bool:
+    """Record a legacy token as migrated into `family_id`; False if it already was (the caller commits)"""
+    result = session.execute(
+        insert(MigratedRefreshToken)
+        .values(token_hash=token_hash, family_id=family_id, migrated_at=datetime.now(timezone.utc), expires_at=expires_at)
+        .on_conflict_do_nothing(index_elements=[MigratedRefreshToken.token_hash])
+    )
+    return result.rowcount == 1
+
+
+def recall_migration(session: Session, token_hash: str):
+    """Pair already issued for a legacy token migrated moments ago, if still in grace"""
+    migrated = session.get(MigratedRefreshToken, token_hash)
+    if migrated is None:
+        return None
+    age = datetime.now(timezone.utc) - _as_utc(migrated.migrated_at)
+    if age > timedelta(seconds=settings.refresh_grace_seconds):
+        return None
+    return recall_rotation(migrated.family_id, 0)
+
+
+def in_grace_window(family: RefreshSession, generation: int) -> bool:
+    """Whether `generation` was rotated away from only moments ago"""
+    if generation != family.generation - 1:
+        return False
+    age = datetime.now(timezone.utc) - _as_utc(family.rotated_at)
+    return age <= timedelta(seconds=settings.refresh_grace_seconds)
+
+
+def revoke_family(session: Session, family_id: str):
+    """Revoke a family immediately (the caller commits)"""
+    session.execute(
+        update(RefreshSession).where(RefreshSession.family_id == family_id).values(revoked=True)
+    )
+
+
+def purge_expired_families(session: Session) -> int:
+    """Delete expired families and migrated legacy tokens (the caller commits)"""
+    now = datetime.now(timezone.utc)
+    session.execute(delete(MigratedRefreshToken).where(MigratedRefreshToken.expires_at < now))
+    result = session.execute(delete(RefreshSession).where(RefreshSession.expires_at < now))
+    return result.rowcount
+
+
+def remember_rotation(family_id: str, generation: int, response):
+    """Keep the pair issued for (family, old generation) for the grace window"""
+    now = time.monotonic()
+    with _grace_lock:
+        if len(_grace_cache) >= MAX_GRACE_ENTRIES:
+            for key in [key for key, (expires, _) in _grace_cache.items() if expires < now]:
+                del _grace_cache[key]
+            if len(_grace_cache) >= MAX_GRACE_ENTRIES:
+                _grace_cache.pop(next(iter(_grace_cache)))
+        _grace_cache[(family_id, generation)] = (now + settings.refresh_grace_seconds, response)
+
+
+def recall_rotation(family_id: str, generation: int):
+    """Return the pair already issued for (family, old generation), if still in grace"""
+    with _grace_lock:
+        entry = _grace_cache.get((family_id, generation))
+    if entry is None or entry[0] < time.monotonic():
+        return None
+    return entry[1]
@@ -0,0 +1,206 @@
+"""按用户把todos分到N个SQLite库（分片0即主库，目录表优先，否则按用户ID哈希）"""
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+import threading
+import time
+import zlib
+
+from sqlmodel import Session, select, and_, or_, delete
+
+from core.config import settings
+from core.database import get_engine, create_sqlite_engine, create_db_and_tables, check_database, warm_up
+from core.stats import store_stats
+from models.shard import UserShard
+from models.stats import TodoStats
+from models.todo import Todo
+
+# Tables that live in every shard; everything else stays in the primary database
+SHARD_TABLES = [Todo.__table__, TodoStats.__table__]
+
+_shard_engines = {}
+_shard_lock = threading.Lock()
+
+
+@dataclass
+class ShardPlacement:
+    shard: int
+    migrating: bool = False
+
+
+def shard_url(index: int) -> str:
+    """Database url of a shard"""
+    if index == 0:
+        return settings.database_url
+    return settings.shard_url_template.format(index=index)
+
+
+def get_shard_engine(index: int):
+    """Get the engine of a shard, creating it on first use"""
+    if index == 0:
+        return get_engine()
+    if not shard_exists(index):
+        raise ValueError(f"Shard {index} out of range (shard_count={settings.shard_count})")
+
+    engine = _shard_engines.get(index)
+    if engine is None:
+        with _shard_lock:
+            engine = _shard_engines.get(index)
+            if engine is None:
+                engine = create_sqlite_engine(shard_url(index))
+                _shard_engines[index] = engine
+    return engine
+
+
+def create_shard_tables():
+    """Create the sharded tables in every secondary shard"""
+    for index in range(1, settings.shard_count):
+        create_db_and_tables(get_shard_engine(index), SHARD_TABLES)
+
+
+def check_shards() -> dict:
+    """Connectivity of every secondary shard, keyed by check name"""
+    # SQLite silently creates a missing file on connect, so probe a shard table
+    return {
+        f"shard_{index}": "ok" if check_database(get_shard_engine(index), "SELECT 1 FROM todos LIMIT 1") else "error"
+        for index in range(1, settings.shard_count)
+    }
+
+
+def warm_up_shards():
+    """Create and warm every secondary shard engine ahead of the first request"""
+    for index in range(1, settings.shard_count):
+        warm_up(get_shard_engine(index))
+
+
+def shard_exists(index: int) -> bool:
+    return 0 <= index < settings.shard_count
+
+
+def hash_shard(user_id: str) -> int:
+    """Stable hash placement, identical across processes and restarts"""
+    return zlib.crc32(user_id.encode("utf-8")) % settings.shard_count
+
+
+def lookup_shard(session: Session, user_id: str) -> ShardPlacement:
+    """Resolve a user's shard from the directory, falling back to the hash"""
+    entry = session.get(UserShard, user_id)
+    if entry is None:
+        return ShardPlacement(shard=hash_shard(user_id))
+    return ShardPlacement(shard=entry.shard, migrating=entry.migrating)
+
+
+def current_placement(user_id: str) -> ShardPlacement:
+    """Read a user's placement in a fresh session, bypassing any identity map"""
+    with Session(get_engine()) as session:
+        return lookup_shard(session, user_id)
+
+
+def _set_directory(user_id: str, shard: int, migrating: bool = False):
+    with Session(get_engine()) as session:
+        entry = session.get(UserShard, user_id) or UserShard(user_id=user_id)
+        entry.shard = shard
+        entry.migrating = migrating
+        entry.updated_at = datetime.now(timezone.utc)
+        session.add(entry)
+        session.commit()
+
+
+def pin_user(user_id: str) -> int:
+    """Record the current placement of a user in the directory.
+
+    Run for every user before changing shard_count, otherwise users without
+    a directory entry would hash to a different shard.
+    """
+    with Session(get_engine()) as session:
+        placement = lookup_shard(session, user_id)
+    _set_directory(user_id, placement.shard, placement.migrating)
+    return placement.shard
+
+
+def _copy_todos(
+    source: int,
+    target: int,
+    user_id: str,
+    since: Optional[Tuple[datetime, str]] = None,
+    batch_size: int = 500
+) -> Tuple[Optional[Tuple[datetime, str]], int]:
+    """Copy a user's todos changed after `since` in (updated_at, id) order"""
+    watermark = since
+    copied = 0
+
+    with Session(get_shard_engine(source)) as src, Session(get_shard_engine(target)) as dst:
+        while True:
+            where_conditions = [Todo.user_id == user_id]
+            if watermark:
+                updated_at, todo_id = watermark
+                where_conditions.append(
+                    or_(
+                        Todo.updated_at > updated_at,
+                        and_(Todo.updated_at == updated_at, Todo.id > todo_id)
+                    )
+                )
+
+            batch = src.exec(
+                select(Todo)
+                .where(and_(*where_conditions))
+                .order_by(Todo.updated_at.asc(), Todo.id.asc())
+                .limit(batch_size)
+            ).all()
+            if not batch:
+                break
+
+            for todo in batch:
+                dst.merge(Todo(**todo.model_dump()))
+            dst.commit()
+            src.expunge_all()
+
+            copied += len(batch)
+            watermark = (batch[-1].updated_at, batch[-1].id)
+
+    return watermark, copied
+
+
+def move_user(user_id: str, target: int, batch_size: int = 500, grace_seconds: float = 2.0) -> int:
+    """Move a user's todos to another shard while the service keeps running.
+
+    1. Bulk copy to the target while reads and writes continue on the source.
+    2. Mark the user as migrating, which makes writes answer 503 and retry;
+       wait `grace_seconds` for in-flight writes, then copy the delta.
+    3. Point the directory at the target and drop the source rows once
+       in-flight reads of the source have finished.
+
+    Soft deletes bump updated_at, so copying by (updated_at, id) sees every change.
+    """
+    get_shard_engine(target)  # validates the index
+
+    with Session(get_engine()) as session:
+        source = lookup_shard(session, user_id).shard
+    if source == target:
+        return 0
+
+    create_db_and_tables(get_shard_engine(target), SHARD_TABLES)
+
+    watermark, copied = _copy_todos(source, target, user_id, batch_size=batch_size)
+
+    _set_directory(user_id, source, migrating=True)
+    try:
+        time.sleep(grace_seconds)
+        _, delta = _copy_todos(source, target, user_id, since=watermark, batch_size=batch_size)
+        copied += delta
+        with Session(get_shard_engine(target)) as dst:
+            store_stats(dst, [user_id])
+            dst.commit()
+    except Exception:
+        _set_directory(user_id, source, migrating=False)
+        raise
+
+    _set_directory(user_id, target, migrating=False)
+
+    time.sleep(grace_seconds)
+    with Session(get_shard_engine(source)) as src:
+        src.execute(delete(Todo).where(Todo.user_id == user_id))
+        src.execute(delete(TodoStats).where(TodoStats.user_id == user_id))
+        src.commit()
+
+    return copied
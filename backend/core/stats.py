@@ -0,0 +1,106 @@
+"""每个用户的todo聚合行，随写操作在同一事务内增量更新"""
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import update, union, case
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session, select, func
+
+from models.stats import TodoStats
+from models.todo import Todo
+
+
+def _count_query(user_ids: Iterable[str]):
+    return (
+        select(
+            Todo.user_id,
+            func.sum(case((Todo.deleted_at.is_(None), 1), else_=0)),
+            func.sum(case((Todo.deleted_at.is_(None) & Todo.done, 1), else_=0)),
+            func.max(Todo.updated_at)
+        )
+        .where(Todo.user_id.in_(list(user_ids)))
+        .group_by(Todo.user_id)
+    )
+
+
+def _upsert(session: Session, rows: list, overwrite: bool):
+    statement = insert(TodoStats).values(rows)
+    if overwrite:
+        statement = statement.on_conflict_do_update(
+            index_elements=[TodoStats.user_id],
+            set_={
+                "total": statement.excluded.total,
+                "done": statement.excluded.done,
+                "updated_at": statement.excluded.updated_at
+            }
+        )
+    else:
+        statement = statement.on_conflict_do_nothing(index_elements=[TodoStats.user_id])
+    session.execute(statement)
+
+
+def compute_stats(session: Session, user_ids: list) -> list:
+    """Recompute aggregate rows from the todos table"""
+    counted = {
+        user_id: {"user_id": user_id, "total": total, "done": done, "updated_at": updated_at}
+        for user_id, total, done, updated_at in session.exec(_count_query(user_ids)).all()
+    }
+    return [
+        counted.get(user_id, {"user_id": user_id, "total": 0, "done": 0, "updated_at": None})
+        for user_id in user_ids
+    ]
+
+
+def apply_stats_delta(session: Session, user_id: str, total: int = 0, done: int = 0):
+    """Adjust a user's aggregate in the caller's transaction (commit is left to the caller)"""
+    result = session.execute(
+        update(TodoStats)
+        .where(TodoStats.user_id == user_id)
+        .values(
+            total=TodoStats.total + total,
+            done=TodoStats.done + done,
+            updated_at=datetime.now(timezone.utc)
+        )
+    )
+    if result.rowcount == 0:
+        # First change for this user: autoflush has already written the pending
+        # todo change, so counting from scratch includes it
+        _upsert(session, compute_stats(session, [user_id]), overwrite=False)
+
+
+def get_stats(session: Session, user_id: str) -> TodoStats:
+    """Read a user's aggregate, creating it on first access"""
+    stats = session.get(TodoStats, user_id)
+    if stats is None:
+        _upsert(session, compute_stats(session, [user_id]), overwrite=False)
+        session.commit()
+        stats = session.get(TodoStats, user_id)
+    return stats
+
+
+def store_stats(session: Session, user_ids: list):
+    """Overwrite the aggregates of the given users with recomputed values"""
+    if user_ids:
+        _upsert(session, compute_stats(session, user_ids), overwrite=True)
+
+
+def repair_stats(engine, batch_size: int = 500, after: Optional[str] = None) -> int:
+    """Recompute every aggregate in one shard, one transaction per batch of users"""
+    repaired = 0
+    user_ids = union(select(Todo.user_id), select(TodoStats.user_id)).subquery()
+
+    with Session(engine) as session:
+        while True:
+            query = select(user_ids.c.user_id).order_by(user_ids.c.user_id).limit(batch_size)
+            if after is not None:
+                query = query.where(user_ids.c.user_id > after)
+            batch = list(session.exec(query).all())
+            if not batch:
+                break
+
+            store_stats(session, batch)
+            session.commit()
+            repaired += len(batch)
+            after = batch[-1]
+
+    return repaired
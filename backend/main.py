@@ -1,23 +1,42 @@
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from contextlib import asynccontextmanager
-import uuid
+import time
 from datetime import datetime, timezone
 
 from core.config import settings
-from core.database import create_db_and_tables
+from core.database import create_db_and_tables, check_database, warm_up
+from core.sharding import create_shard_tables, check_shards, warm_up_shards
+from core.metrics import metrics
+from core.middleware import RequestContextMiddleware
+from core.profiling import ProfilingMiddleware, continuous_profiler
+from core.jobs import job_runner
+from core.memory import memory_watchdog
 from core.exceptions import APIException, api_exception_handler, validation_exception_handler, http_exception_handler
-from api.v1 import auth, todos
+from api.v1 import auth, todos, admin
+from api.deps import require_admin
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Execute on startup
-    create_db_and_tables()
+    started = time.perf_counter()
+    app.state.schema_migrated = create_db_and_tables()
+    create_shard_tables()
+    app.state.startup_seconds = time.perf_counter() - started
+    if settings.profiler_autostart:
+        continuous_profiler.start()
+    if settings.job_runner_enabled:
+        job_runner.start()
+    memory_watchdog.start()
     yield
-    # Execute on shutdown (if needed)
+    # Execute on shutdown
+    memory_watchdog.stop()
+    job_runner.stop()
+    continuous_profiler.stop()
 
 
 app = FastAPI(
@@ -35,20 +54,45 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Request ID middleware
-@app.middleware("http")
-async def add_request_id(request: Request, call_next):
-    request_id = str(uuid.uuid4())
-    request.state.request_id = request_id
-    response = await call_next(request)
-    response.headers["X-Request-ID"] = request_id
-    return response
+# Per-request profiling, only installed when admin endpoints are enabled
+if settings.admin_token:
+    app.add_middleware(ProfilingMiddleware)
 
-# Health check
+# Request ID, timing, metrics and error mapping (pure ASGI). Added last, so it wraps
+# every user middleware; only Starlette's ServerErrorMiddleware sits outside it
+app.add_middleware(RequestContextMiddleware)
+
+# Health check (liveness: the process is up, no dependencies are touched)
 @app.get("/healthz")
+@app.get("/livez")
 async def health_check():
     return {"status": "ok", "timestamp": datetime.now(timezone.utc).isoformat()}
 
+# Readiness: every database (primary and shards) answers and hot-path statements are warmed
+@app.get("/readyz")
+def readiness_check():
+    timestamp = datetime.now(timezone.utc).isoformat()
+    if memory_watchdog.draining:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "draining", "checks": {"memory": "over_budget"}, "timestamp": timestamp}
+        )
+    checks = {"database": "ok" if check_database() else "error", **check_shards()}
+    if any(result != "ok" for result in checks.values()):
+        return JSONResponse(
+            status_code=503,
+            content={"status": "unavailable", "checks": checks, "timestamp": timestamp}
+        )
+
+    warm_up()
+    warm_up_shards()
+    return {"status": "ready", "checks": checks, "timestamp": timestamp}
+
+# Metrics (Prometheus text format), admin-only like the other diagnostics: scrape with X-Admin-Token
+@app.get("/metrics", dependencies=[Depends(require_admin)])
+async def get_metrics():
+    return PlainTextResponse(metrics.render())
+
 # Register exception handlers
 app.add_exception_handler(APIException, api_exception_handler)
 app.add_exception_handler(RequestValidationError, validation_exception_handler)
@@ -57,23 +101,7 @@ app.add_exception_handler(StarletteHTTPException, http_exception_handler)
 # Route registration
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["auth"])
 app.include_router(todos.router, prefix="/api/v1/todos", tags=["todos"])
-
-# Global exception handler for unhandled exceptions
-@app.exception_handler(Exception)
-async def global_exception_handler(request: Request, exc: Exception):
-    request_id = getattr(request.state, "request_id", "unknown")
-    from fastapi.responses import JSONResponse
-    return JSONResponse(
-        status_code=500,
-        content={
-            "error": {
-                "code": "INTERNAL_SERVER_ERROR",
-                "message": "An unexpected error occurred"
-            },
-            "requestId": request_id
-        },
-        headers={"X-Request-ID": request_id}
-    )
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["admin"])
 
 if __name__ == "__main__":
     import uvicorn
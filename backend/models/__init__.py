@@ -0,0 +1,10 @@
+import importlib
+
+# 所有定义表的模块：建表前必须全部导入，否则create_all会漏掉未导入的表
+TABLE_MODULES = ("user", "todo", "shard", "stats", "session", "job")
+
+
+def load_all_models():
+    """导入所有表模型，注册到SQLModel.metadata"""
+    for name in TABLE_MODULES:
+        importlib.import_module(f"{__name__}.{name}")
@@ -0,0 +1,22 @@
+from sqlmodel import SQLModel, Field
+from typing import Optional
+from datetime import datetime, timezone
+
+
+class Job(SQLModel, table=True):
+    """Durable background job, claimed by the in-process runner"""
+    __tablename__ = "jobs"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str = Field(max_length=100)
+    # Idempotency key: a second enqueue with the same key is ignored
+    key: Optional[str] = Field(default=None, max_length=255, unique=True)
+    payload: str = Field(default="{}")
+    status: str = Field(default="pending", max_length=20, index=True)
+    attempts: int = Field(default=0)
+    max_attempts: int = Field(default=5)
+    run_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), index=True)
+    locked_at: Optional[datetime] = Field(default=None)
+    last_error: Optional[str] = Field(default=None)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -0,0 +1,25 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime, timezone
+import secrets
+
+
+class RefreshSession(SQLModel, table=True):
+    """One row per login (refresh-token family), rotated independently of other sessions"""
+    __tablename__ = "refresh_sessions"
+
+    family_id: str = Field(default_factory=lambda: secrets.token_hex(8), primary_key=True)
+    user_id: str = Field(foreign_key="users.id", index=True)
+    generation: int = Field(default=1)
+    revoked: bool = Field(default=False)
+    rotated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    expires_at: datetime
+
+
+class MigratedRefreshToken(SQLModel, table=True):
+    """Legacy (pre-family) refresh tokens that were already exchanged for a family"""
+    __tablename__ = "migrated_refresh_tokens"
+
+    token_hash: str = Field(primary_key=True)
+    family_id: str
+    migrated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    expires_at: datetime
@@ -0,0 +1,12 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime, timezone
+
+
+class UserShard(SQLModel, table=True):
+    """Shard directory entry, overrides the hash placement of a user"""
+    __tablename__ = "user_shards"
+
+    user_id: str = Field(primary_key=True, foreign_key="users.id")
+    shard: int = Field(default=0)
+    migrating: bool = Field(default=False)
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -0,0 +1,20 @@
+from sqlmodel import SQLModel, Field
+from typing import Optional
+from datetime import datetime
+
+
+class TodoStats(SQLModel, table=True):
+    """Per-user aggregate, maintained in the same transaction as each todo change"""
+    __tablename__ = "todo_stats"
+
+    user_id: str = Field(primary_key=True)
+    total: int = Field(default=0)
+    done: int = Field(default=0)
+    updated_at: Optional[datetime] = Field(default=None)
+
+
+class TodoStatsRead(SQLModel):
+    total: int
+    done: int
+    open: int
+    last_updated: Optional[datetime]
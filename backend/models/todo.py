@@ -40,4 +40,16 @@ class TodoRead(SQLModel):
 class TodoDeleted(SQLModel):
     id: str
     deleted: bool = True
-    updated_at: datetime
\ No newline at end of file
+    updated_at: datetime
+
+# Bulk import result
+class TodoImportError(SQLModel):
+    line: int
+    message: str
+
+
+class TodoImportResult(SQLModel):
+    imported: int
+    failed: int
+    batches: int
+    errors: list[TodoImportError] = []
@@ -0,0 +1,54 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Optional
+
+class ProfilerStartRequest(BaseModel):
+    interval: Optional[float] = Field(None, ge=0.001, le=10)
+    window_seconds: Optional[int] = Field(None, ge=10, le=86400)
+
+class ProfilerStatus(BaseModel):
+    running: bool
+    pid: int
+    interval: float
+    window_seconds: int
+    samples: int
+
+class TracemallocStartRequest(BaseModel):
+    frames: int = Field(10, ge=1, le=100)
+
+class TracemallocStatus(BaseModel):
+    tracing: bool
+
+class GcSummary(BaseModel):
+    counts: List[int]
+    thresholds: List[int]
+    generations: List[dict]
+    garbage: int
+
+class ObjectCount(BaseModel):
+    type: str
+    count: int
+
+class MemoryReport(BaseModel):
+    pid: int
+    rss_bytes: int
+    budget_bytes: Optional[int]
+    gc: GcSummary
+    tracked_objects: int
+    objects: List[ObjectCount]
+    tracemalloc: bool
+
+class SnapshotInfo(BaseModel):
+    id: int
+    taken_at: datetime
+
+class Snapshot(SnapshotInfo):
+    traced_bytes: int
+    peak_bytes: int
+
+class SnapshotDiffEntry(BaseModel):
+    location: str
+    size_diff: int
+    size: int
+    count_diff: int
+    count: int
@@ -1,14 +1,283 @@
+import json
+import os
+import tempfile
+import uuid
 import pytest
+
+# 测试使用临时数据库，不写入仓库中的data/todo.db
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/todo.db")
+
 from fastapi.testclient import TestClient
 from main import app
 
 client = TestClient(app)
 
+def unique_email(prefix: str) -> str:
+    """每次运行使用不同的邮箱，测试可以重复执行"""
+    return f"{prefix}-{uuid.uuid4().hex[:12]}@example.com"
+
+@pytest.fixture(scope="module", autouse=True)
+def run_lifespan():
+    # 执行启动流程（建表/分片初始化）
+    with client:
+        yield
+
 def test_health_check():
     response = client.get("/healthz")
     assert response.status_code == 200
     assert "status" in response.json()
 
+def test_liveness_and_readiness():
+    response = client.get("/livez")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ok"
+
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "ready"
+    assert data["checks"]["database"] == "ok"
+
+def test_request_id_and_error_contract(monkeypatch):
+    from core.config import settings
+
+    response = client.get("/api/v1/todos/")
+    assert response.status_code == 401
+    request_id = response.headers["X-Request-ID"]
+    assert response.json()["requestId"] == request_id
+    assert "server-timing" in response.headers
+
+    # 指标只对管理员开放
+    assert client.get("/metrics").status_code == 403
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    response = client.get("/metrics", headers={"X-Admin-Token": "secret"})
+    assert 'http_requests_total{method="GET",status="401"}' in response.text
+
+def test_unhandled_error_mapped_to_500():
+    from starlette.applications import Starlette
+    from starlette.routing import Route
+    from core.middleware import RequestContextMiddleware
+
+    async def boom(request):
+        raise RuntimeError("boom")
+
+    app = Starlette(routes=[Route("/boom", boom)])
+    app.add_middleware(RequestContextMiddleware)
+    response = TestClient(app).get("/boom")
+    assert response.status_code == 500
+    assert response.json() == {
+        "error": {"code": "INTERNAL_SERVER_ERROR", "message": "An unexpected error occurred"},
+        "requestId": response.headers["X-Request-ID"]
+    }
+
+def test_admin_profiler(monkeypatch):
+    import time
+    from core.config import settings
+
+    response = client.get("/api/v1/admin/profiler")
+    assert response.status_code == 403
+
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    headers = {"X-Admin-Token": "secret"}
+    assert client.get("/api/v1/admin/profiler", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    response = client.post("/api/v1/admin/profiler/start", json={"interval": 0.01}, headers=headers)
+    assert response.json()["running"] is True
+    time.sleep(0.2)
+    response = client.post("/api/v1/admin/profiler/stop", headers=headers)
+    assert response.json()["running"] is False
+    assert response.json()["samples"] > 0
+
+    response = client.get("/api/v1/admin/profiler/profile", headers=headers)
+    assert response.status_code == 200
+    stack, count = response.text.splitlines()[0].rsplit(" ", 1)
+    assert ";" in stack and int(count) > 0
+
+def test_admin_memory(monkeypatch):
+    from core.config import settings
+    from core.memory import memory_watchdog
+
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    headers = {"X-Admin-Token": "secret"}
+
+    report = client.get("/api/v1/admin/memory?top=5", headers=headers).json()
+    assert report["rss_bytes"] > 0
+    assert len(report["objects"]) == 5
+    assert "generations" in report["gc"]
+
+    response = client.post("/api/v1/admin/memory/snapshots", headers=headers)
+    assert response.json()["error"]["code"] == "TRACEMALLOC_NOT_RUNNING"
+
+    client.post("/api/v1/admin/memory/tracemalloc/start", json={"frames": 5}, headers=headers)
+    try:
+        base = client.post("/api/v1/admin/memory/snapshots", headers=headers).json()["id"]
+        leak = [bytearray(1024) for _ in range(1000)]
+        target = client.post("/api/v1/admin/memory/snapshots", headers=headers).json()["id"]
+        diff = client.get(f"/api/v1/admin/memory/snapshots/diff?base={base}&target={target}", headers=headers).json()
+        assert any("test_api.py" in item["location"] and item["size_diff"] >= 1024 * 1000 for item in diff)
+        del leak
+    finally:
+        client.post("/api/v1/admin/memory/tracemalloc/stop", headers=headers)
+
+    # 超出内存预算的worker不再报告就绪
+    monkeypatch.setattr(memory_watchdog, "draining", True)
+    assert client.get("/readyz").status_code == 503
+
+def test_request_profiling(monkeypatch):
+    import time
+    from starlette.applications import Starlette
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Route
+    from core.config import settings
+    from core.middleware import RequestContextMiddleware
+    from core.profiling import ProfilingMiddleware, get_request_profile
+
+    monkeypatch.setattr(settings, "admin_token", "secret")
+
+    def slow(request):
+        time.sleep(0.05)
+        return PlainTextResponse("ok")
+
+    def fast(request):
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[Route("/slow", slow), Route("/fast", fast)])
+    app.add_middleware(ProfilingMiddleware)
+    app.add_middleware(RequestContextMiddleware)
+    test_client = TestClient(app)
+
+    response = test_client.get("/slow", headers={"X-Profile": "1", "X-Admin-Token": "wrong"})
+    assert "x-profile-id" not in response.headers
+
+    response = test_client.get("/slow", headers={"X-Profile": "1", "X-Admin-Token": "secret"})
+    profile_id = response.headers["x-profile-id"]
+    assert profile_id == response.headers["x-request-id"]
+    assert "slow" in get_request_profile(profile_id)
+
+    # 短于一个采样间隔的请求也有采样结果
+    response = test_client.get("/fast", headers={"X-Profile": "1", "X-Admin-Token": "secret"})
+    assert get_request_profile(response.headers["x-profile-id"]).strip()
+
+def test_profiler_skips_idle_and_own_threads():
+    import threading
+    from core.profiling import collect_stacks
+
+    stop = threading.Event()
+    idle = threading.Thread(target=stop.wait, name="idle-waiter")
+    idle.start()
+    try:
+        stacks = collect_stacks()
+        assert not any(stack.startswith("idle-waiter;") for stack in stacks)
+        assert not any(stack.startswith(("job-runner;", "memory-watchdog;")) for stack in stacks)
+        assert any(stack.startswith("MainThread;") for stack in stacks)
+    finally:
+        stop.set()
+        idle.join()
+
+def test_job_queue_idempotency_and_retry():
+    from sqlmodel import Session, select, create_engine
+    from core.database import get_engine
+    from core.jobs import job_runner, job_handler, enqueue
+    from models.job import Job
+
+    calls = []
+
+    @job_handler("test.flaky")
+    def flaky(payload):
+        calls.append(payload["n"])
+        if len(calls) == 1:
+            raise RuntimeError("first attempt fails")
+
+    key = f"test-flaky-{uuid.uuid4().hex}"
+    job_runner.stop()  # 测试中手动驱动
+    try:
+        with Session(get_engine()) as session:
+            enqueue(session, "test.flaky", {"n": 1}, key=key)
+            enqueue(session, "test.flaky", {"n": 2}, key=key)
+            session.commit()
+
+        # jobs表只在主库中：分片会话不能入队
+        with Session(create_engine("sqlite://")) as session:
+            with pytest.raises(ValueError):
+                enqueue(session, "test.flaky", {"n": 3})
+
+        assert job_runner.run_pending() >= 1
+        with Session(get_engine()) as session:
+            job = session.exec(select(Job).where(Job.key == key)).one()
+            assert (job.status, job.attempts) == ("pending", 1)
+            assert "first attempt fails" in job.last_error
+
+            # 跳过退避时间后重试成功
+            job.run_at = job.created_at
+            session.add(job)
+            session.commit()
+
+        job_runner.run_pending()
+        with Session(get_engine()) as session:
+            job = session.exec(select(Job).where(Job.key == key)).one()
+            assert (job.status, job.attempts) == ("done", 2)
+        assert calls == [1, 1]
+    finally:
+        job_runner.start()
+
+def test_job_runner_recovers_from_claim_errors(monkeypatch):
+    import threading
+    from sqlmodel import Session
+    from core import jobs
+    from core.database import get_engine
+
+    done = threading.Event()
+    jobs.job_handler("test.after-errors")(lambda payload: done.set())
+
+    real_claim = jobs.claim_next_job
+    failures = []
+
+    def flaky_claim():
+        if len(failures) < 3:
+            failures.append(1)
+            raise RuntimeError("database is locked")
+        return real_claim()
+
+    monkeypatch.setattr(jobs, "claim_next_job", flaky_claim)
+    jobs.job_runner.stop()
+    runner = jobs.JobRunner(workers=2, poll_interval=0.05)
+    try:
+        with Session(get_engine()) as session:
+            jobs.enqueue(session, "test.after-errors", key=f"test-after-errors-{uuid.uuid4().hex}")
+            session.commit()
+        runner.start()
+        # 认领失败后归还槽位，任务最终仍会执行
+        assert done.wait(5)
+        assert len(failures) == 3
+    finally:
+        runner.stop()
+        jobs.job_runner.start()
+
+def test_schema_creation_skipped_when_version_matches():
+    from core.database import create_db_and_tables, get_schema_version, SCHEMA_VERSION
+
+    create_db_and_tables()
+    assert get_schema_version() == SCHEMA_VERSION
+    assert create_db_and_tables() is False
+
+def test_schema_creation_imports_every_table(tmp_path):
+    import subprocess
+    import sys
+
+    # 全新进程中只导入core.database，建表后版本号必须代表完整的表结构
+    script = (
+        "from sqlalchemy import inspect\n"
+        "from core.database import create_sqlite_engine, create_db_and_tables\n"
+        f"engine = create_sqlite_engine('sqlite:///{tmp_path}/fresh.db')\n"
+        "create_db_and_tables(engine)\n"
+        "print(' '.join(sorted(inspect(engine).get_table_names())))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True, text=True, check=True
+    ).stdout
+    assert output.strip().splitlines()[-1].split() == ["jobs", "migrated_refresh_tokens", "refresh_sessions", "todo_stats", "todos", "user_shards", "users"]
+
 def test_signup():
     user_data = {
         "email": "test@example.com",
@@ -40,6 +309,70 @@ def test_login():
     assert "refresh_token" in data
     assert data["token_type"] == "bearer"
 
+def test_refresh_token_rotation(monkeypatch):
+    from core.config import settings
+
+    user_data = {"email": unique_email("refresh"), "password": "test123456"}
+    client.post("/api/v1/auth/signup", json=user_data)
+    first = client.post("/api/v1/auth/login", json=user_data).json()
+    second = client.post("/api/v1/auth/login", json=user_data).json()
+
+    # 并发的重复刷新拿到同一对令牌
+    rotated = client.post("/api/v1/auth/refresh", json={"refresh_token": first["refresh_token"]})
+    duplicate = client.post("/api/v1/auth/refresh", json={"refresh_token": first["refresh_token"]})
+    assert rotated.status_code == 200
+    assert duplicate.json()["refresh_token"] == rotated.json()["refresh_token"]
+
+    # 其他会话不受影响
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": second["refresh_token"]})
+    assert response.status_code == 200
+
+    # 宽限期外重用旧令牌：吊销整个会话族
+    monkeypatch.setattr(settings, "refresh_grace_seconds", -1)
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": first["refresh_token"]})
+    assert response.status_code == 401
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": rotated.json()["refresh_token"]})
+    assert response.json()["error"]["code"] == "TOKEN_REVOKED"
+
+def test_legacy_refresh_token_migrates_once(monkeypatch):
+    from core.config import settings
+    from core.security import create_refresh_token
+
+    user_data = {"email": unique_email("legacy"), "password": "test123456"}
+    client.post("/api/v1/auth/signup", json=user_data)
+    login = client.post("/api/v1/auth/login", json=user_data).json()
+    user = login["user"]
+
+    # 没有会话族信息的旧格式令牌
+    legacy = create_refresh_token(data={"sub": user["id"], "email": user["email"], "token_version": 1})
+    migrated = client.post("/api/v1/auth/refresh", json={"refresh_token": legacy})
+    assert migrated.status_code == 200
+
+    # 并发的重复迁移拿到同一对令牌；宽限期过后旧令牌不能再次迁移
+    duplicate = client.post("/api/v1/auth/refresh", json={"refresh_token": legacy})
+    assert duplicate.json()["refresh_token"] == migrated.json()["refresh_token"]
+    monkeypatch.setattr(settings, "refresh_grace_seconds", -1)
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": legacy})
+    assert response.json()["error"]["code"] == "TOKEN_REVOKED"
+
+    # 迁移得到的新令牌正常轮换
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": migrated.json()["refresh_token"]})
+    assert response.status_code == 200
+
+    # 迁移不影响该用户的其他会话
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": login["refresh_token"]})
+    assert response.status_code == 200
+
+def test_logout_revokes_session():
+    user_data = {"email": unique_email("logout"), "password": "test123456"}
+    client.post("/api/v1/auth/signup", json=user_data)
+    tokens = client.post("/api/v1/auth/login", json=user_data).json()
+
+    response = client.post("/api/v1/auth/logout", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 204
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+
 def test_protected_route_without_token():
     response = client.get("/api/v1/todos/")
     assert response.status_code == 401
@@ -89,5 +422,164 @@ def test_todo_crud():
     data = response.json()
     assert len(data["items"]) == 0
 
+def test_todo_stats():
+    user_data = {"email": unique_email("stats"), "password": "test123456"}
+    client.post("/api/v1/auth/signup", json=user_data)
+    token = client.post("/api/v1/auth/login", json=user_data).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = client.get("/api/v1/todos/stats", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"total": 0, "done": 0, "open": 0, "last_updated": None}
+
+    ids = [client.post("/api/v1/todos/", json={"title": f"t{i}"}, headers=headers).json()["id"] for i in range(3)]
+    client.patch(f"/api/v1/todos/{ids[0]}", json={"done": True}, headers=headers)
+    client.patch(f"/api/v1/todos/{ids[1]}", json={"done": True}, headers=headers)
+    client.patch(f"/api/v1/todos/{ids[1]}", json={"title": "renamed"}, headers=headers)
+    client.delete(f"/api/v1/todos/{ids[0]}", headers=headers)
+    client.post("/api/v1/todos/import", content='{"title": "x", "done": true}\n', headers=headers)
+
+    stats = client.get("/api/v1/todos/stats", headers=headers).json()
+    assert (stats["total"], stats["done"], stats["open"]) == (3, 2, 1)
+    assert stats["last_updated"] is not None
+
+    # 修复任务重算的结果与增量维护一致
+    from core.database import get_engine
+    from core.stats import repair_stats
+    assert repair_stats(get_engine(), batch_size=2) > 0
+    repaired = client.get("/api/v1/todos/stats", headers=headers).json()
+    assert (repaired["total"], repaired["done"], repaired["open"]) == (3, 2, 1)
+
+def test_stats_repair_tool(tmp_path):
+    import subprocess
+    import sys
+
+    # 在全新进程和全新数据库上运行文档中的修复命令
+    result = subprocess.run(
+        [sys.executable, "-m", "tools.stats", "repair"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env={**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path}/repair.db"},
+        capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert "shard 0: repaired 0 users" in result.stdout
+
+def test_export_and_import():
+    user_data = {"email": unique_email("transfer"), "password": "test123456"}
+    client.post("/api/v1/auth/signup", json=user_data)
+    token = client.post("/api/v1/auth/login", json=user_data).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    # NDJSON导入，包含一条非法记录
+    body = '{"title": "a"}\n{"title": "b", "done": true}\n{"title": ""}\nnot json\n'
+    response = client.post("/api/v1/todos/import?batch_size=1", content=body,
+                           headers={**headers, "Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    result = response.json()
+    assert result["imported"] == 2
+    assert result["failed"] == 2
+    assert [e["line"] for e in result["errors"]] == [3, 4]
+
+    # CSV导入
+    body = "title,done\nc,yes\nd,\n"
+    response = client.post("/api/v1/todos/import", content=body, headers={**headers, "Content-Type": "text/csv"})
+    assert response.json()["imported"] == 2
+
+    todo_id = client.get("/api/v1/todos/", headers=headers).json()["items"][0]["id"]
+    client.delete(f"/api/v1/todos/{todo_id}", headers=headers)
+
+    response = client.get("/api/v1/todos/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["title"] for line in lines) == ["b", "c", "d"]
+    assert sum(line["done"] for line in lines) == 2
+
+    response = client.get("/api/v1/todos/export?include_deleted=true", headers=headers)
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 4
+    assert [line["id"] for line in lines if line.get("deleted")] == [todo_id]
+
+    # 非UTF-8、超长行和跨行引号字段都记为失败行，而不是500或错误拆分
+    body = b'title\n\xff\xfe\n"multi\nline"\n' + b"x" * (64 * 1024 + 1) + b"\ne\n"
+    response = client.post("/api/v1/todos/import", content=body, headers={**headers, "Content-Type": "text/csv"})
+    assert response.status_code == 200
+    result = response.json()
+    assert result["imported"] == 1
+    assert result["failed"] == 3
+    assert [e["line"] for e in result["errors"]] == [2, 3, 5]
+
+def test_move_user_between_shards(tmp_path, monkeypatch):
+    from core import sharding
+    from core.config import settings
+    from core.database import get_engine
+    from sqlmodel import Session, select
+    from models.shard import UserShard
+    from models.todo import Todo
+
+    monkeypatch.setattr(settings, "shard_count", 2)
+    monkeypatch.setattr(settings, "shard_url_template", f"sqlite:///{tmp_path}/shard-{{index}}.db")
+    monkeypatch.setattr(sharding, "_shard_engines", {})
+    sharding.create_shard_tables()
+
+    user_data = {"email": unique_email("shard"), "password": "test123456"}
+    user_id = client.post("/api/v1/auth/signup", json=user_data).json()["id"]
+    token = client.post("/api/v1/auth/login", json=user_data).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    try:
+        sharding.pin_user(user_id)
+        source = sharding.hash_shard(user_id)
+        target = 1 - source
+        for i in range(3):
+            client.post("/api/v1/todos/", json={"title": f"Todo {i}"}, headers=headers)
+
+        assert sharding.move_user(user_id, target, batch_size=2, grace_seconds=0) == 3
+
+        with Session(sharding.get_shard_engine(source)) as session:
+            assert session.exec(select(Todo).where(Todo.user_id == user_id)).all() == []
+        with Session(sharding.get_shard_engine(target)) as session:
+            assert len(session.exec(select(Todo).where(Todo.user_id == user_id)).all()) == 3
+
+        response = client.get("/api/v1/todos/", headers=headers)
+        assert response.status_code == 200
+        assert len(response.json()["items"]) == 3
+        assert client.get("/api/v1/todos/stats", headers=headers).json()["total"] == 3
+
+        # 就绪检查覆盖所有分片
+        assert client.get("/readyz").json()["checks"] == {"database": "ok", "shard_1": "ok"}
+
+        # 导入途中开始迁移：已提交的批次保留，剩余部分以SHARD_MIGRATING中止
+        from api.v1 import todos as todos_api
+        checks = []
+
+        def placement_then_migrate(uid):
+            # 第一批提交之后开始迁移
+            checks.append(uid)
+            if len(checks) == 3:
+                sharding._set_directory(uid, target, migrating=True)
+            return sharding.current_placement(uid)
+
+        monkeypatch.setattr(todos_api, "current_placement", placement_then_migrate)
+        response = client.post("/api/v1/todos/import?batch_size=1", content="title\nfirst\nsecond\n",
+                               headers={**headers, "Content-Type": "text/csv"})
+        assert response.status_code == 503
+        assert response.json()["error"]["code"] == "SHARD_MIGRATING"
+        assert response.json()["error"]["details"]["imported"] == 1
+        sharding._set_directory(user_id, target, migrating=False)
+
+        # 目录指向不存在的分片时返回明确的错误
+        sharding._set_directory(user_id, 5)
+        response = client.get("/api/v1/todos/", headers=headers)
+        assert response.status_code == 503
+        assert response.json()["error"]["code"] == "SHARD_UNAVAILABLE"
+    finally:
+        # 不在共享库中留下指向临时分片的目录项
+        with Session(get_engine()) as session:
+            entry = session.get(UserShard, user_id)
+            if entry is not None:
+                session.delete(entry)
+                session.commit()
+
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file
@@ -0,0 +1,91 @@
+"""Shard maintenance commands.
+
+Usage (from the backend directory):
+    python -m tools.shards status
+    python -m tools.shards pin                  # record current placement of every user
+    python -m tools.shards move <user_id> <shard>
+    python -m tools.shards rebalance            # move users to their hash shard
+
+Before raising SHARD_COUNT, run `pin` with the old value so existing users keep
+their shard, then restart with the new value and `move`/`rebalance` at leisure.
+"""
+import argparse
+
+from sqlmodel import Session, select, func
+
+from core.config import settings
+from core.database import get_engine, create_db_and_tables
+from core.sharding import get_shard_engine, create_shard_tables, lookup_shard, hash_shard, pin_user, move_user
+from models.user import User
+from models.todo import Todo
+
+
+def _user_ids():
+    with Session(get_engine()) as session:
+        return list(session.exec(select(User.id)).all())
+
+
+def status():
+    counts = {}
+    for index in range(settings.shard_count):
+        with Session(get_shard_engine(index)) as session:
+            counts[index] = session.exec(select(func.count()).select_from(Todo)).one()
+
+    users = {index: 0 for index in range(settings.shard_count)}
+    with Session(get_engine()) as session:
+        for user_id in _user_ids():
+            users[lookup_shard(session, user_id).shard] += 1
+
+    for index in range(settings.shard_count):
+        print(f"shard {index}: {users[index]} users, {counts[index]} todos")
+
+
+def pin():
+    for user_id in _user_ids():
+        pin_user(user_id)
+    print("pinned all users")
+
+
+def move(user_id: str, shard: int, batch_size: int, grace_seconds: float):
+    copied = move_user(user_id, shard, batch_size=batch_size, grace_seconds=grace_seconds)
+    print(f"moved {user_id} to shard {shard} ({copied} rows copied)")
+
+
+def rebalance(batch_size: int, grace_seconds: float):
+    with Session(get_engine()) as session:
+        placements = {user_id: lookup_shard(session, user_id).shard for user_id in _user_ids()}
+
+    for user_id, shard in placements.items():
+        target = hash_shard(user_id)
+        if target != shard:
+            move(user_id, target, batch_size, grace_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shard maintenance")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--grace-seconds", type=float, default=2.0)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status")
+    sub.add_parser("pin")
+    move_parser = sub.add_parser("move")
+    move_parser.add_argument("user_id")
+    move_parser.add_argument("shard", type=int)
+    sub.add_parser("rebalance")
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    create_shard_tables()
+
+    if args.command == "status":
+        status()
+    elif args.command == "pin":
+        pin()
+    elif args.command == "move":
+        move(args.user_id, args.shard, args.batch_size, args.grace_seconds)
+    elif args.command == "rebalance":
+        rebalance(args.batch_size, args.grace_seconds)
+
+
+if __name__ == "__main__":
+    main()
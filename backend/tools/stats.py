@@ -0,0 +1,34 @@
+"""Todo aggregate maintenance.
+
+Usage (from the backend directory):
+    python -m tools.stats repair [--batch-size 500]
+
+Recomputes every row of todo_stats from the todos table, shard by shard,
+committing one batch of users at a time so writers are never blocked long.
+"""
+import argparse
+
+from core.config import settings
+from core.database import create_db_and_tables
+from core.sharding import get_shard_engine, create_shard_tables
+from core.stats import repair_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Todo aggregate maintenance")
+    parser.add_argument("--batch-size", type=int, default=500)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("repair")
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    create_shard_tables()
+
+    if args.command == "repair":
+        for index in range(settings.shard_count):
+            repaired = repair_stats(get_shard_engine(index), batch_size=args.batch_size)
+            print(f"shard {index}: repaired {repaired} users")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import csv
+import json
+from typing import AsyncIterator, Optional, Tuple
+
+from pydantic import ValidationError
+
+from models.todo import TodoCreate
+
+MAX_LINE_BYTES = 64 * 1024
+
+_TRUE_VALUES = {"true", "1", "yes", "y"}
+_FALSE_VALUES = {"false", "0", "no", "n", ""}
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int = MAX_LINE_BYTES) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """把字节流切分为行（未解码）。
+
+    只扫描新收到的字节；超过max_line_bytes的行不再缓冲，以None返回。
+    """
+    pending = []
+    pending_len = 0
+    overflow = False
+    line_no = 0
+
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            piece = chunk[start:] if end == -1 else chunk[start:end]
+
+            if not overflow and pending_len + len(piece) > max_line_bytes:
+                overflow = True
+                pending = []
+                pending_len = 0
+            elif not overflow and piece:
+                pending.append(piece)
+                pending_len += len(piece)
+
+            if end == -1:
+                break
+
+            line_no += 1
+            yield line_no, None if overflow else b"".join(pending)
+            pending = []
+            pending_len = 0
+            overflow = False
+            start = end + 1
+
+    if pending or overflow:
+        yield line_no + 1, None if overflow else b"".join(pending)
+
+
+def decode_line(raw: Optional[bytes]) -> str:
+    """解码一行，超长或非UTF-8时抛出ValueError"""
+    if raw is None:
+        raise ValueError(f"Line exceeds {MAX_LINE_BYTES} bytes")
+    try:
+        return raw.decode("utf-8").rstrip("\r")
+    except UnicodeDecodeError:
+        raise ValueError("Invalid UTF-8")
+
+
+def parse_done(value) -> bool:
+    """解析done字段"""
+    if isinstance(value, bool):
+        return value
+    if value is None:
+        return False
+    text = str(value).strip().lower()
+    if text in _TRUE_VALUES:
+        return True
+    if text in _FALSE_VALUES:
+        return False
+    raise ValueError(f"Invalid boolean value: {value}")
+
+
+def validate_record(title, done) -> Tuple[str, bool]:
+    """按TodoCreate的规则校验一条记录"""
+    try:
+        todo = TodoCreate.model_validate({"title": title})
+    except ValidationError as exc:
+        raise ValueError(exc.errors()[0]["msg"])
+    return todo.title, parse_done(done)
+
+
+def parse_ndjson_line(line: str) -> Tuple[str, bool]:
+    """解析一行NDJSON"""
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError:
+        raise ValueError("Invalid JSON")
+    if not isinstance(record, dict):
+        raise ValueError("Each line must be a JSON object")
+    return validate_record(record.get("title"), record.get("done"))
+
+
+class CsvRecordParser:
+    """逐行解析CSV：第一行为表头，之后每行一条记录。
+
+    不支持跨行的引号字段：起始行报错，后续的续行直到引号闭合都被跳过。
+    """
+
+    def __init__(self):
+        self.title_index: Optional[int] = None
+        self.done_index: Optional[int] = None
+        self.in_multiline_field = False
+
+    @property
+    def has_header(self) -> bool:
+        return self.title_index is not None
+
+    def parse_header(self, line: str):
+        """解析表头，找到title和done所在列"""
+        columns = [column.strip().lower() for column in next(csv.reader([line]))]
+        if "title" not in columns:
+            raise ValueError("CSV header must contain a 'title' column")
+        self.title_index = columns.index("title")
+        self.done_index = columns.index("done") if "done" in columns else None
+
+    def parse(self, line: str) -> Optional[Tuple[str, bool]]:
+        """解析一条记录；返回None表示该行是已报错记录的续行"""
+        if self.in_multiline_field:
+            # 奇数个引号说明引号字段在这一行闭合
+            if line.count('"') % 2 == 1:
+                self.in_multiline_field = False
+            return None
+
+        try:
+            values = next(csv.reader([line], strict=True))
+        except csv.Error:
+            self.in_multiline_field = True
+            raise ValueError("Quoted field spans multiple lines, which is not supported")
+
+        if self.title_index >= len(values):
+            raise ValueError("Missing title column")
+        done = values[self.done_index] if self.done_index is not None and self.done_index < len(values) else None
+        return validate_record(values[self.title_index], done)
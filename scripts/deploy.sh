@@ -39,7 +39,7 @@ sleep 30
 
 # 健康检查
 echo "Performing health check..."
-if curl -f http://localhost:8000/healthz; then
+if curl -f http://localhost:8000/readyz; then
     echo "✅ Deployment successful!"
 else
     echo "❌ Health check failed!"